@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Agent Resolver
+Paginated, cached name-to-ID index for Bedrock agents and their aliases
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+
+class AgentResolver:
+    """Resolves agent and alias names to IDs across every page of results.
+
+    Listings are cached for ttl_seconds; call invalidate() after creating or
+    deleting agents or aliases so the next lookup re-reads them.
+    """
+
+    def __init__(self, client, ttl_seconds: float = 30.0):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+        self._agents: Optional[Tuple[float, List[Dict[str, Any]], Dict[str, str]]] = None
+        self._aliases: Dict[str, Tuple[float, List[Dict[str, Any]], Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+        self.list_calls = 0
+
+    def _paginate(self, operation: str, result_key: str, **kwargs) -> List[Dict[str, Any]]:
+        """Collect every item from a paginated list operation."""
+        items = []
+        for page in self.client.get_paginator(operation).paginate(**kwargs):
+            self.list_calls += 1
+            items.extend(page.get(result_key, []))
+        return items
+
+    def _fresh(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at < self.ttl_seconds
+
+    def agents(self) -> List[Dict[str, Any]]:
+        """Return every agent summary in the account."""
+        return self._agent_index()[0]
+
+    def _agent_index(self) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        with self._lock:
+            if self._agents is None or not self._fresh(self._agents[0]):
+                summaries = self._paginate("list_agents", "agentSummaries")
+                # Keep the first agent listed for a name, matching next() on the listing
+                index: Dict[str, str] = {}
+                for summary in summaries:
+                    index.setdefault(summary['agentName'], summary['agentId'])
+                self._agents = (time.monotonic(), summaries, index)
+            return self._agents[1], self._agents[2]
+
+    def find_agent_id(self, agent_name: str) -> Optional[str]:
+        """Return the ID of the agent with this name, or None."""
+        return self._agent_index()[1].get(agent_name)
+
+    def aliases(self, agent_id: str) -> List[Dict[str, Any]]:
+        """Return every alias summary for an agent."""
+        return self._alias_index(agent_id)[0]
+
+    def _alias_index(self, agent_id: str) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        with self._lock:
+            cached = self._aliases.get(agent_id)
+            if cached is None or not self._fresh(cached[0]):
+                summaries = self._paginate("list_agent_aliases", "agentAliasSummaries", agentId=agent_id)
+                index: Dict[str, str] = {}
+                for summary in summaries:
+                    index.setdefault(summary.get('agentAliasName'), summary['agentAliasId'])
+                cached = (time.monotonic(), summaries, index)
+                self._aliases[agent_id] = cached
+            return cached[1], cached[2]
+
+    def find_alias_id(self, agent_id: str, alias_name: str) -> Optional[str]:
+        """Return the ID of the alias with this name on the agent, or None."""
+        return self._alias_index(agent_id)[1].get(alias_name)
+
+    def invalidate(self, agent_id: Optional[str] = None) -> None:
+        """Drop cached listings.
+
+        With no argument the agent index is dropped; with an agent ID that
+        agent's alias index is dropped as well.
+        """
+        with self._lock:
+            self._agents = None
+            if agent_id is not None:
+                self._aliases.pop(agent_id, None)
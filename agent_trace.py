@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Agent Traces
+Turns the trace events of an invoke_agent stream into a per-step timeline
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Iterable, List
+
+from metrics import quantile
+
+# Time after the last trace event, while the answer text streams in
+RESPONSE_STEP = "response"
+
+
+@dataclass
+class TraceEvent:
+    """One trace event, with the time since the previous event charged to its step.
+
+    The trace API carries no timestamps, so times are measured when each
+    event arrives; the gap before an event is the time the agent spent
+    producing it.
+    """
+    step: str
+    kind: str
+    offset: float
+    duration: float
+    trace_id: str = ""
+    input_chars: Optional[int] = None
+    output_chars: Optional[int] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+@dataclass
+class ModelInvocation:
+    """A model call inside an agent step, paired from its input and output events."""
+    step: str
+    trace_id: str
+    duration: float
+    input_chars: Optional[int] = None
+    output_chars: Optional[int] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+def _step_name(trace_key: str) -> str:
+    # "preProcessingTrace" -> "preProcessing"
+    return trace_key[:-len("Trace")] if trace_key.endswith("Trace") else trace_key
+
+
+def _text_length(value: Any) -> Optional[int]:
+    return len(value) if isinstance(value, str) else None
+
+
+def _describe(kind: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Pull sizes out of a trace payload where the API provides them."""
+    details: Dict[str, Any] = {"trace_id": body.get("traceId", "")}
+    if kind == "modelInvocationInput":
+        details["input_chars"] = _text_length(body.get("text"))
+    elif kind == "modelInvocationOutput":
+        details["output_chars"] = _text_length((body.get("rawResponse") or {}).get("content"))
+        usage = (body.get("metadata") or {}).get("usage") or {}
+        details["input_tokens"] = usage.get("inputTokens")
+        details["output_tokens"] = usage.get("outputTokens")
+    elif kind == "rationale":
+        details["output_chars"] = _text_length(body.get("text"))
+    elif kind == "observation":
+        details["output_chars"] = _text_length((body.get("finalResponse") or {}).get("text"))
+    return details
+
+
+class AgentTrace:
+    """The timeline of one traced agent request and the answer it produced."""
+
+    def __init__(self, query: str = "", session_id: str = ""):
+        self.query = query
+        self.session_id = session_id
+        self.response: Optional[str] = None
+        self.events: List[TraceEvent] = []
+        self.total = 0.0
+        self._started = time.perf_counter()
+        self._last = 0.0
+
+    def start(self) -> None:
+        """Reset the clock; call right before the request is sent."""
+        self._started = time.perf_counter()
+        self._last = 0.0
+
+    def add(self, part: Dict[str, Any]) -> None:
+        """Add a "trace" event from the completion stream."""
+        offset = time.perf_counter() - self._started
+        for trace_key, body in (part.get("trace") or {}).items():
+            step = _step_name(trace_key)
+            if not isinstance(body, dict):
+                continue
+            # Step traces wrap one payload keyed by its kind; failure and
+            # guardrail traces are the payload themselves
+            payloads = [(kind, value) for kind, value in body.items() if isinstance(value, dict)]
+            if not payloads or trace_key in ("failureTrace", "guardrailTrace"):
+                payloads = [(step, body)]
+            for kind, payload in payloads:
+                self.events.append(TraceEvent(step=step, kind=kind, offset=offset,
+                                              duration=offset - self._last, **_describe(kind, payload)))
+                self._last = offset
+
+    def finish(self) -> None:
+        """Close the timeline once the stream has ended."""
+        self.total = time.perf_counter() - self._started
+
+    def step_durations(self) -> Dict[str, float]:
+        """Return seconds per agent step, including the final response stream."""
+        durations: Dict[str, float] = {}
+        for event in self.events:
+            durations[event.step] = durations.get(event.step, 0.0) + event.duration
+        if self.total > self._last:
+            durations[RESPONSE_STEP] = self.total - self._last
+        return durations
+
+    def model_invocations(self) -> List[ModelInvocation]:
+        """Pair model input and output events by trace ID."""
+        inputs: Dict[str, TraceEvent] = {}
+        invocations = []
+        for event in self.events:
+            if event.kind == "modelInvocationInput":
+                inputs[event.trace_id] = event
+            elif event.kind == "modelInvocationOutput":
+                start = inputs.pop(event.trace_id, None)
+                invocations.append(ModelInvocation(
+                    step=event.step,
+                    trace_id=event.trace_id,
+                    duration=event.offset - start.offset if start else event.duration,
+                    input_chars=start.input_chars if start else None,
+                    output_chars=event.output_chars,
+                    input_tokens=event.input_tokens,
+                    output_tokens=event.output_tokens,
+                ))
+        return invocations
+
+    def timeline(self) -> List[str]:
+        """Human-readable lines, one per trace event."""
+        lines = []
+        for event in self.events:
+            sizes = [f"{name.replace('_', ' ')} {value}"
+                     for name in ("input_chars", "output_chars", "input_tokens", "output_tokens")
+                     for value in [getattr(event, name)] if value is not None]
+            line = f"{event.offset * 1000:8.0f}ms  +{event.duration * 1000:6.0f}ms  {event.step}/{event.kind}"
+            if sizes:
+                line += f" ({', '.join(sizes)})"
+            lines.append(line)
+        if self.total > self._last:
+            lines.append(f"{self.total * 1000:8.0f}ms  +{(self.total - self._last) * 1000:6.0f}ms  {RESPONSE_STEP}")
+        return lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the trace as plain data, e.g. for JSON."""
+        return {
+            "query": self.query,
+            "session_id": self.session_id,
+            "response": self.response,
+            "total": self.total,
+            "steps": self.step_durations(),
+            "events": [vars(event) for event in self.events],
+        }
+
+
+@dataclass
+class StepSummary:
+    """Latency of one agent step across a sample of traced requests."""
+    step: str
+    requests: int = 0
+    total: float = 0.0
+    durations: List[float] = field(default_factory=list)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.requests if self.requests else 0.0
+
+    @property
+    def p95(self) -> float:
+        p95 = quantile(self.durations, 0.95)
+        return p95 if p95 is not None else 0.0
+
+
+def summarize_traces(traces: Iterable[AgentTrace]) -> List[StepSummary]:
+    """Aggregate step durations, slowest step (by total time) first."""
+    steps: Dict[str, StepSummary] = {}
+    for trace in traces:
+        for step, seconds in trace.step_durations().items():
+            summary = steps.setdefault(step, StepSummary(step))
+            summary.requests += 1
+            summary.total += seconds
+            summary.durations.append(seconds)
+    return sorted(steps.values(), key=lambda summary: summary.total, reverse=True)
+
+
+def format_summary(summaries: List[StepSummary]) -> List[str]:
+    """Table lines for summarize_traces() output, with each step's share of the time."""
+    grand_total = sum(summary.total for summary in summaries) or 1.0
+    lines = [f"{'step':<16} {'requests':>8} {'mean ms':>9} {'p95 ms':>9} {'share':>7}"]
+    for summary in summaries:
+        lines.append(f"{summary.step:<16} {summary.requests:>8} {summary.mean * 1000:>9.0f} "
+                     f"{summary.p95 * 1000:>9.0f} {summary.total / grand_total:>7.1%}")
+    return lines
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Async Agent
+asyncio front end for BookBuddyAgent that serves many conversations from one event loop
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, AsyncIterator
+
+from bookbuddy import BookBuddyAgent
+
+_DONE = object()
+
+
+class AsyncBookBuddyAgent:
+    """Async counterpart of BookBuddyAgent with bounded concurrency and cancellation.
+
+    boto3 has no native asyncio support, so each in-flight invoke_agent stream
+    is read on a worker thread and handed to the event loop chunk by chunk.
+    Post-processing, caching and prompt building are delegated to the wrapped
+    synchronous agent so both classes produce identical answers.
+    """
+
+    def __init__(self, agent: BookBuddyAgent, max_concurrency: int = 100):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="bookbuddy-async")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+
+    def _slots(self) -> asyncio.Semaphore:
+        """Create the concurrency semaphore on the running loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def initialize(self) -> bool:
+        """Run the blocking agent initialization off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.agent.initialize)
+
+    async def chat_stream(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False) -> AsyncIterator[str]:
+        """Yield raw response text as it arrives.
+
+        Cancelling the consuming task (or closing the generator) tells the
+        worker thread to stop reading the Bedrock stream at its next chunk.
+        The concurrency slot is held until that thread has returned, so no
+        more streams are admitted than there are worker threads to read them.
+        """
+        slots = self._slots()
+        await slots.acquire()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def release() -> None:
+            self.in_flight -= 1
+            slots.release()
+
+        def deliver(item) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # Event loop already closed
+                cancelled.set()
+
+        def produce() -> None:
+            try:
+                stream = self.agent.chat_stream(user_input, session_id, include_summary=include_summary)
+                try:
+                    for text in stream:
+                        if cancelled.is_set():
+                            return
+                        deliver((text, None))
+                    deliver((_DONE, None))
+                except Exception as e:
+                    deliver((None, e))
+                finally:
+                    stream.close()
+            finally:
+                try:
+                    loop.call_soon_threadsafe(release)
+                except RuntimeError:
+                    # Event loop already closed
+                    pass
+
+        self.in_flight += 1
+        try:
+            loop.run_in_executor(self._executor, produce)
+        except BaseException:
+            release()
+            raise
+        try:
+            while True:
+                text, error = await queue.get()
+                if error is not None:
+                    raise error
+                if text is _DONE:
+                    break
+                yield text
+        finally:
+            cancelled.set()
+
+    async def chat(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False) -> str:
+        """Send a message to BookBuddy and get response."""
+        try:
+            chunks = []
+            async for text in self.chat_stream(user_input, session_id, include_summary=include_summary):
+                chunks.append(text)
+            return self.agent.clean_response("".join(chunks))
+        except Exception as e:
+            return f"❌ Error: {e}"
+
+    def close(self) -> None:
+        """Stop the worker threads without waiting for abandoned streams."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self) -> "AsyncBookBuddyAgent":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
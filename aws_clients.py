@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+BookBuddy AWS Clients
+Shared boto3 clients, cached per (service, region) with tuned connection settings
+"""
+
+import threading
+from typing import Optional, Dict, Any, Tuple
+
+import boto3
+from botocore.config import Config
+
+# Sized for the default AsyncBookBuddyAgent concurrency so streams never
+# queue for a connection
+DEFAULT_CLIENT_SETTINGS: Dict[str, Any] = {
+    "max_pool_connections": 100,
+    "tcp_keepalive": True,
+    "connect_timeout": 5,
+    "read_timeout": 120,
+    "retry_mode": "adaptive",
+    "max_attempts": 5,
+}
+
+_settings: Dict[str, Any] = dict(DEFAULT_CLIENT_SETTINGS)
+_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+_session: Optional[boto3.session.Session] = None
+_lock = threading.Lock()
+
+
+def configure_clients(**settings: Any) -> None:
+    """Change client settings; clients created afterwards use the new values.
+
+    Accepts any key of DEFAULT_CLIENT_SETTINGS. Cached clients are dropped so
+    the next get_client() call picks the settings up.
+    """
+    unknown = set(settings) - set(DEFAULT_CLIENT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {', '.join(sorted(unknown))}")
+
+    with _lock:
+        _settings.update(settings)
+        _clients.clear()
+
+
+def client_config() -> Config:
+    """Build the botocore Config for the current settings."""
+    return Config(
+        max_pool_connections=_settings["max_pool_connections"],
+        tcp_keepalive=_settings["tcp_keepalive"],
+        connect_timeout=_settings["connect_timeout"],
+        read_timeout=_settings["read_timeout"],
+        retries={"mode": _settings["retry_mode"], "max_attempts": _settings["max_attempts"]},
+    )
+
+
+def get_client(service: str, region: Optional[str] = None):
+    """Return the shared client for a service and region, creating it once."""
+    global _session
+
+    key = (service, region)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    # boto3 sessions are not thread-safe while creating clients
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(service, region_name=region, config=client_config())
+            _clients[key] = client
+        return client
+
+
+def reset_clients() -> None:
+    """Drop every cached client and the session, e.g. after credentials change."""
+    global _session
+
+    with _lock:
+        _clients.clear()
+        _session = None
@@ -0,0 +1,4 @@
+"""
+BookBuddy Benchmarks
+Benchmarks for the BookBuddy request path; only the live comparisons need AWS access
+"""
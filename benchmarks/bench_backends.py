@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Backend Latency Benchmark
+Compares the Bedrock Agents backend with the direct model backend on the
+same queries: time to first chunk, total latency and tokens per answer
+
+Needs AWS access. The agent backend runs with traces on so its token usage
+is known; pass --no-trace to time it without the trace overhead.
+
+Usage:
+    python3 -m benchmarks.bench_backends --rounds 5
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.live import cell, run_queries, summarize
+from bookbuddy import BACKENDS, BookBuddyAgent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the agent and direct backends")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each query is asked per backend (default: 3)")
+    parser.add_argument("--no-trace", action="store_true", help="Time the agent without traces (no token counts)")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'requests':>8} {'errors':>6} {'TTFC p50':>9} {'TTFC p95':>9} "
+          f"{'total p50':>10} {'total p95':>10} {'in tok':>7} {'out tok':>7}")
+    for backend in BACKENDS:
+        bookbuddy = BookBuddyAgent(backend=backend, trace=not args.no_trace and backend == "agent", coalesce=False)
+        records = run_queries(bookbuddy, args.rounds, backend)
+        if records is None:
+            continue
+        row = summarize(records)
+        print(f"{backend:<8} {row['requests']:>8} {row['errors']:>6} {cell(row['first_chunk_p50'], 9)} "
+              f"{cell(row['first_chunk_p95'], 9)} {cell(row['total_p50'], 10)} {cell(row['total_p95'], 10)} "
+              f"{cell(row['input_tokens'], 7)} {cell(row['output_tokens'], 7)}")
+    print("Latencies in ms; tokens are the mean per answer")
+
+
+if __name__ == "__main__":
+    main()
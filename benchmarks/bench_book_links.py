@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Book Link Injection Benchmark
+Times add_missing_links against the legacy book regex as responses grow,
+including pathological inputs, and checks both give the same output
+
+Usage:
+    python3 -m benchmarks.bench_book_links [--max-size 65536] [--budget 2.0] [--fuzz 0]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postprocessing
+from benchmarks import legacy
+from benchmarks.corpus import ADVERSARIAL_SHAPES, make_response
+
+# Fragments for random inputs; weighted toward the characters the book
+# pattern cares about
+FUZZ_TOKENS = ["by", "by", " by ", " ", " ", "\t", " ", "\n", "\n\n", "*", "**",
+               "-", "–", " -", "x", "Ti", "a b", "**T**", "b", "y"]
+
+
+def best_time(func: Callable[[str], str], text: str, repeat: int = 3) -> float:
+    """Return the fastest of repeat runs of func(text), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fuzz(iterations: int, seed: int = 0) -> bool:
+    """Compare both implementations on random inputs; return True if all agree."""
+    rng = random.Random(seed)
+    for i in range(iterations):
+        text = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(0, 60)))
+        if legacy.enhance_response_with_links(text) != postprocessing.add_missing_links(text):
+            print(f"❌ Output mismatch after {i} inputs for {text!r}")
+            return False
+    print(f"✅ {iterations} random inputs gave identical output")
+    return True
+
+
+def format_ms(seconds: Optional[float]) -> str:
+    return "skipped" if seconds is None else f"{seconds * 1e3:.2f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark book link injection")
+    parser.add_argument("--max-size", type=int, default=65536,
+                        help="Largest response size in characters (default: 65536)")
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="Stop timing the legacy regex once one run exceeds this many seconds")
+    parser.add_argument("--fuzz", type=int, default=0,
+                        help="Also compare outputs on this many random inputs")
+    args = parser.parse_args()
+
+    shapes = dict(ADVERSARIAL_SHAPES)
+    shapes["no_links"] = lambda size: make_response(max(1, size // 100), with_links=False)
+
+    print(f"{'shape':<16} {'chars':>7} {'legacy ms':>10} {'scanner ms':>11} {'growth':>7}")
+    for name, build in shapes.items():
+        legacy_over_budget = False
+        previous = None
+        size = 1024
+        while size <= args.max_size:
+            text = build(size)
+            after = best_time(postprocessing.add_missing_links, text)
+
+            before = None
+            if not legacy_over_budget:
+                before = best_time(legacy.enhance_response_with_links, text, repeat=1)
+                legacy_over_budget = before > args.budget
+                if legacy.enhance_response_with_links(text) != postprocessing.add_missing_links(text):
+                    print(f"❌ Output mismatch for {name} at {len(text)} chars")
+
+            # Doubling the input should roughly double a linear scan
+            growth = f"{after / previous:.2f}x" if previous else ""
+            print(f"{name:<16} {len(text):>7} {format_ms(before):>10} {format_ms(after):>11} {growth:>7}")
+            previous = after
+            size *= 2
+
+    if args.fuzz:
+        fuzz(args.fuzz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Output Format Benchmark
+Compares the model writing finished Markdown answers with it writing compact
+JSON that BookBuddy renders locally: output tokens and end-to-end latency
+
+The offline part needs no AWS: it sizes the same books in both formats and
+times turning each into the final answer. With --live, both formats are
+asked the same queries through the chosen backend; token counts come from
+the model's usage (the agent backend runs with traces on to get them).
+
+Usage:
+    python3 -m benchmarks.bench_output_format
+    python3 -m benchmarks.bench_output_format --live --backend direct --rounds 5
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import make_json_response, make_response
+from benchmarks.live import cell, run_queries, summarize
+from bookbuddy import BACKENDS, OUTPUT_FORMATS, BookBuddyAgent
+from postprocessing import process_response
+from rate_governor import CHARS_PER_TOKEN
+from recommendations import render_json_answer
+
+
+def run_offline(number: int = 2000) -> None:
+    """Compare answer sizes and local rendering time for synthetic answers."""
+    print(f"{'answer':<18} {'format':<9} {'chars':>6} {'~tokens':>8} {'render us':>10}")
+    for num_books in (3, 10):
+        for with_summary in (False, True):
+            name = f"{num_books}_books{'_summary' if with_summary else ''}"
+            answers = {
+                "markdown": (make_response(num_books, with_summary=with_summary), process_response),
+                "json": (make_json_response(num_books, with_summary=with_summary), render_json_answer),
+            }
+            for output_format, (answer, render) in answers.items():
+                seconds = timeit.timeit(lambda: render(answer), number=number) / number
+                print(f"{name:<18} {output_format:<9} {len(answer):>6} "
+                      f"{len(answer) // CHARS_PER_TOKEN:>8} {seconds * 1e6:>10.1f}")
+    print(f"~tokens assumes {CHARS_PER_TOKEN} characters per token; use --live for real counts")
+
+
+def run_live(backend: str, rounds: int) -> None:
+    """Ask the sample queries in both formats and compare latency and output tokens."""
+    print(f"{'format':<9} {'requests':>8} {'errors':>6} {'total p50':>10} {'total p95':>10} {'out tok':>7}")
+    for output_format in OUTPUT_FORMATS:
+        # Traces carry the agent backend's token usage
+        bookbuddy = BookBuddyAgent(backend=backend, output_format=output_format,
+                                   trace=backend == "agent", coalesce=False)
+        records = run_queries(bookbuddy, rounds, f"{backend}-{output_format}")
+        if records is None:
+            continue
+        row = summarize(records)
+        print(f"{output_format:<9} {row['requests']:>8} {row['errors']:>6} {cell(row['total_p50'], 10)} "
+              f"{cell(row['total_p95'], 10)} {cell(row['output_tokens'], 7)}")
+    print(f"Backend: {backend}; latencies in ms; tokens are the mean per answer")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare Markdown and compact JSON model output")
+    parser.add_argument("--live", action="store_true", help="Also ask Bedrock the sample queries in both formats")
+    parser.add_argument("--backend", choices=BACKENDS, default="direct", help="Backend for --live (default: direct)")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each query is asked per format (default: 3)")
+    args = parser.parse_args()
+
+    run_offline()
+    if args.live:
+        print()
+        run_live(args.backend, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Post-processing Throughput Benchmark
+Compares the shared postprocessing pipeline with the legacy regex chain
+
+Malformed-URL responses differ on purpose: the legacy repair rebuilt a
+link from the first book header in the 300 characters before it, which is
+often the previous book.
+
+Usage:
+    python3 -m benchmarks.bench_postprocessing
+"""
+
+import os
+import sys
+import timeit
+from typing import Callable, Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postprocessing
+from benchmarks import legacy
+from benchmarks.corpus import standard_corpus
+
+STAGES: Dict[str, Tuple[Callable[[str], str], Callable[[str], str]]] = {
+    "text": (lambda text: legacy.clean_amazon_urls(legacy.clean_response(text)), postprocessing.process_response),
+    "html": (lambda text: legacy.render_response_html(legacy.clean_response(text)),
+             lambda text: postprocessing.render_response_html(postprocessing.process_response(text))),
+}
+
+
+def throughput(func: Callable[[str], str], text: str, min_time: float = 0.2) -> float:
+    """Return processed megabytes per second for func over text."""
+    timer = timeit.Timer(lambda: func(text))
+    number, elapsed = timer.autorange()
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return len(text.encode("utf-8")) * number / elapsed / 1e6
+
+
+def main() -> None:
+    corpus = standard_corpus()
+    print(f"{'stage':<6} {'response':<24} {'bytes':>7} {'legacy MB/s':>12} {'pipeline MB/s':>14} {'speedup':>8} {'output':>7}")
+
+    for stage, (legacy_func, pipeline_func) in STAGES.items():
+        for name, text in corpus.items():
+            same = "same" if legacy_func(text) == pipeline_func(text) else "differs"
+            before = throughput(legacy_func, text)
+            after = throughput(pipeline_func, text)
+            print(f"{stage:<6} {name:<24} {len(text.encode('utf-8')):>7} {before:>12.2f} {after:>14.2f} {after / before:>7.2f}x {same:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark Corpus
+Synthetic agent responses in the formats BookBuddy sees in production
+"""
+
+import json
+import random
+from typing import Dict, List, Tuple
+
+BOOKS: List[Tuple[str, str, str, str]] = [
+    ("Atomic Habits", "James Clear",
+     "Build good habits and break bad ones with this practical guide",
+     "Clear explains how tiny changes compound into remarkable results. He introduces the four laws of behavior change and shows how to design systems instead of chasing goals."),
+    ("The Power of Habit", "Charles Duhigg",
+     "Why we do what we do in life and business",
+     "Duhigg explores the science of habit formation through the cue-routine-reward loop. Stories from companies and individuals show how keystone habits transform lives."),
+    ("Think and Grow Rich", "Napoleon Hill",
+     "Classic success mindset book with timeless principles",
+     "Based on interviews with successful people, Hill distills thirteen principles of achievement. The book argues that desire, faith and persistence drive success."),
+    ("The Power of Now", "Eckhart Tolle",
+     "Mindfulness and present-moment awareness guide",
+     "Tolle argues that suffering comes from identifying with the mind. He offers practices for living in the present moment and quieting compulsive thought."),
+    ("Dune", "Frank Herbert",
+     "Epic science fiction saga of politics, religion and ecology",
+     "Young Paul Atreides is thrust into a deadly struggle for the desert planet Arrakis. The novel weaves politics, prophecy and ecology into a sweeping tale of power."),
+    ("The Left Hand of Darkness", "Ursula K. Le Guin",
+     "Groundbreaking exploration of gender on an alien world",
+     "An envoy visits the planet Gethen, whose people have no fixed sex. His journey across the ice becomes a meditation on loyalty, trust and identity."),
+    ("Mindset", "Carol Dweck",
+     "How a simple idea about the brain can help you learn and grow",
+     "Dweck contrasts fixed and growth mindsets and shows how beliefs about ability shape achievement in school, work, sports and relationships."),
+    ("The 7 Habits of Highly Effective People", "Stephen Covey",
+     "Timeless principles for personal and professional effectiveness",
+     "Covey presents a principle-centered approach to solving personal and professional problems, moving from dependence to independence to interdependence."),
+    ("Gone Girl", "Gillian Flynn",
+     "A twisty psychological thriller about a marriage gone wrong",
+     "When Amy Dunne disappears on her fifth wedding anniversary, suspicion falls on her husband Nick. Alternating narrators reveal a marriage built on lies."),
+    ("Sapiens", "Yuval Noah Harari",
+     "A brief history of humankind",
+     "Harari traces humanity from the cognitive revolution through agriculture and science. He asks how shared myths let strangers cooperate at massive scale."),
+]
+
+INTROS = [
+    "Here are great book recommendations for you:",
+    "Bot: Here are some books you might enjoy:",
+    "Assistant: Great choice! Here are my picks:",
+]
+
+
+def _query(title: str, author: str) -> str:
+    return f"{title} {author}".replace(".", "").replace(" ", "+")
+
+
+def make_response(num_books: int,
+                  with_summary: bool = False,
+                  with_links: bool = True,
+                  malformed_urls: bool = False,
+                  seed: int = 0) -> str:
+    """Build a synthetic agent answer with num_books recommendations."""
+    rng = random.Random(seed)
+    lines = [rng.choice(INTROS), ""]
+
+    for i in range(num_books):
+        title, author, description, summary = BOOKS[i % len(BOOKS)]
+        if not with_links:
+            # The shape enhance_response_with_links has to repair
+            lines.append(f"**{title}** by {author} - {description}")
+            lines.append("")
+            continue
+
+        lines.append(f"📚 **{title}** by {author}")
+        lines.append(description)
+        if with_summary:
+            lines.append("")
+            lines.append("📖 **What it's about:**")
+            lines.append(summary)
+            lines.append("")
+
+        url = f"https://amazon.com/s?k={_query(title, author)}"
+        if malformed_urls and i % 2 == 0:
+            # The model sometimes runs the description into the URL
+            url += "+" + description.replace(" ", "+") + "+" + "Bestseller+Edition+Paperback"
+        lines.append(f"🛒 Buy: {url}")
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def make_json_response(num_books: int, with_summary: bool = False, seed: int = 0) -> str:
+    """Build the compact JSON answer carrying the same books as make_response()."""
+    rng = random.Random(seed)
+    books = []
+    for i in range(num_books):
+        title, author, description, summary = BOOKS[i % len(BOOKS)]
+        book = {"title": title, "author": author, "blurb": description}
+        if with_summary:
+            book["summary"] = summary
+        books.append(book)
+    intro = rng.choice(INTROS).split(": ", 1)[-1]
+    return json.dumps({"intro": intro, "books": books}, ensure_ascii=False)
+
+
+def standard_corpus() -> Dict[str, str]:
+    """Named responses covering sizes from 1 to 50 books in every format."""
+    corpus = {}
+    for size in (1, 3, 10, 50):
+        corpus[f"{size}_books"] = make_response(size)
+        corpus[f"{size}_books_summary"] = make_response(size, with_summary=True)
+        corpus[f"{size}_books_no_links"] = make_response(size, with_links=False)
+        corpus[f"{size}_books_malformed"] = make_response(size, malformed_urls=True)
+    return corpus
+
+
+def _repeat_to(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+# Link-less shapes that make the old book regex backtrack, keyed by name.
+# Each builder returns a response of roughly the given size in characters.
+ADVERSARIAL_SHAPES = {
+    # One long line with no "by": every start position rescans the line
+    "long_line": lambda size: _repeat_to("lorem ipsum dolor sit amet ", size),
+    # Many "by" tokens whose authors stop at a bare dash
+    "dangling_by": lambda size: _repeat_to("a by -", size),
+    # A long line that only fails at its very end
+    "by_at_line_end": lambda size: _repeat_to("word ", size) + "by -\n",
+    # Many "Title by Author" pairs on a single line
+    "books_one_line": lambda size: _repeat_to("**Dune** by Frank Herbert, ", size),
+    # Blank-line runs between "by" and the author
+    "blank_line_runs": lambda size: ("Title by" + "\n" * 50 + "  ") * max(1, size // 60),
+}
+
+
+def adversarial_corpus(size: int) -> Dict[str, str]:
+    """Pathological link-less responses of about size characters."""
+    return {name: build(size) for name, build in ADVERSARIAL_SHAPES.items()}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Legacy Post-processing Chain
+The per-call regex chain used by chat() and the Streamlit UI before the
+shared postprocessing pipeline, kept verbatim as a benchmark baseline.
+"""
+
+import re
+
+
+def generate_amazon_url(title, author):
+    import re
+
+    title = title.strip().strip('"').strip("'").strip()
+    author = author.strip().strip('"').strip("'").strip()
+
+    search_query = f"{title} {author}"
+    search_query = re.sub(r'[^\w\s]', '', search_query)
+    search_query = search_query.replace(" ", "+")
+    search_query = re.sub(r'\++', '+', search_query)
+    search_query = search_query.strip('+')
+
+    return f"https://amazon.com/s?k={search_query}"
+
+
+def enhance_response_with_links(response):
+    import re
+
+    book_pattern = r'([*]{0,2})([^*\n]+?)([*]{0,2})\s+by\s+([^-–\n]+?)(?:\s*[-–]\s*([^\n]+?))?(?:\n|$)'
+
+    def add_amazon_link(match):
+        title = match.group(2).strip()
+        author = match.group(4).strip().rstrip('-–').strip()
+        description = match.group(5) if match.group(5) else ""
+
+        title = title.strip().strip('-–').strip()
+        author = author.strip().strip('-–').strip()
+
+        amazon_url = generate_amazon_url(title, author)
+
+        result = f"📚 **{title}** by {author}"
+        if description:
+            result += f"\n{description}"
+        result += f"\n🛒 Buy: {amazon_url}\n"
+
+        return result
+
+    if "amazon.com" not in response.lower():
+        enhanced = re.sub(book_pattern, add_amazon_link, response, flags=re.MULTILINE)
+        return enhanced
+
+    return response
+
+
+def clean_response(output_text):
+    cleaned_output = output_text.strip()
+
+    prefixes_to_remove = ["Bot:", "Assistant:", "AI:", "BookBuddy:", "Human:", "User:"]
+    for prefix in prefixes_to_remove:
+        if cleaned_output.startswith(prefix):
+            cleaned_output = cleaned_output[len(prefix):].strip()
+            break
+
+    import re
+    cleaned_output = re.sub(r'\n\s*Bot:\s*', '\n', cleaned_output)
+    cleaned_output = re.sub(r'\s+Bot:\s*', ' ', cleaned_output)
+
+    cleaned_output = re.sub(r'\n\s*\n', '\n\n', cleaned_output)
+    cleaned_output = cleaned_output.strip()
+
+    return enhance_response_with_links(cleaned_output)
+
+
+def convert_markdown_to_html(text):
+    import re
+    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
+    return text
+
+
+def clean_amazon_urls(text):
+    import re
+
+    def fix_url(match):
+        full_url = match.group(0)
+        if len(full_url) > 80:
+            context = text[:match.start()]
+
+            patterns = [
+                r'📚\s*\*\*(.*?)\*\*\s*by\s*(.*?)(?:\n|$)',
+                r'book\s+"([^"]+)"\s*by\s*([^\n]+)',
+                r'The\s+Power\s+of\s+Habit.*?Charles\s+Duhigg',
+            ]
+
+            for pattern in patterns:
+                book_match = re.search(pattern, context[-300:], re.IGNORECASE)
+                if book_match:
+                    if len(book_match.groups()) >= 2:
+                        title = book_match.group(1).strip()
+                        author = book_match.group(2).strip()
+                    else:
+                        title = "The Power of Habit"
+                        author = "Charles Duhigg"
+
+                    title = re.sub(r'[^\w\s]', '', title).replace(' ', '+')
+                    author = re.sub(r'[^\w\s]', '', author).replace(' ', '+')
+                    return f"https://amazon.com/s?k={title}+{author}"
+
+            if "Power+of+Habit" in full_url or "Power+Habit" in full_url:
+                return "https://amazon.com/s?k=The+Power+of+Habit+Charles+Duhigg"
+
+        return full_url
+
+    text = re.sub(r'https://amazon\.com/s\?k=[^\s\n]+', fix_url, text)
+    return text
+
+
+def format_summary_sections(text):
+    import re
+
+    def format_summary(match):
+        summary_text = match.group(0)
+        formatted = f'<div class="summary-section">{summary_text}</div>'
+        return formatted
+
+    text = re.sub(r'📖[^\n]*(?:\n(?!📚|🛒)[^\n]*)*', format_summary, text, flags=re.MULTILINE)
+    return text
+
+
+def make_links_clickable(text):
+    import re
+
+    def create_link(match):
+        url = match.group(0)
+        return f'<a href="{url}" target="_blank" style="color: #007bff; text-decoration: underline;">{url}</a>'
+
+    text = re.sub(r'https://amazon\.com/s\?k=[^\s\n]+', create_link, text)
+    return text
+
+
+def render_response_html(response):
+    cleaned_response = clean_amazon_urls(response)
+    summary_formatted = format_summary_sections(cleaned_response)
+    clickable_links = make_links_clickable(summary_formatted)
+    return convert_markdown_to_html(clickable_links)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Live Benchmark Helpers
+Asks Bedrock a fixed set of sample queries and summarizes the chat log
+records, shared by the benchmarks that compare agent configurations
+"""
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookbuddy import BookBuddyAgent
+from metrics import quantile
+
+QUERIES = [
+    ("motivational books", False),
+    ("sci-fi novels", False),
+    ("books about habits", True),
+    ("mystery novels", False),
+]
+
+
+def run_queries(bookbuddy: BookBuddyAgent, rounds: int, name: str) -> Optional[List[Dict[str, Any]]]:
+    """Answer every query rounds times and return the chat log records, or None if setup fails."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ready = bookbuddy.initialize()
+    if not ready:
+        print(f"❌ Could not initialize BookBuddy for {name}")
+        return None
+
+    bookbuddy.metrics.recent_records.clear()
+    records = []
+    for round_number in range(rounds):
+        for query, include_summary in QUERIES:
+            # A fresh session each time so agent memory does not shorten answers
+            session_id = f"bench-{name}-{round_number}-{len(records)}"
+            with contextlib.redirect_stdout(io.StringIO()):
+                bookbuddy.chat(query, session_id=session_id, include_summary=include_summary)
+            records.append(bookbuddy.metrics.recent_records[-1])
+    return records
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """Error count, latency quantiles (ms) and mean token counts of chat log records."""
+    ok = [record for record in records if "error" not in record]
+    first_chunks = [record["phases_ms"]["first_chunk"] for record in ok if "first_chunk" in record["phases_ms"]]
+    totals = [record["phases_ms"]["total"] for record in ok]
+    input_tokens = [record["input_tokens"] for record in ok if record.get("input_tokens")]
+    output_tokens = [record["output_tokens"] for record in ok if record.get("output_tokens")]
+    return {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "first_chunk_p50": quantile(first_chunks, 0.5),
+        "first_chunk_p95": quantile(first_chunks, 0.95),
+        "total_p50": quantile(totals, 0.5),
+        "total_p95": quantile(totals, 0.95),
+        "input_tokens": statistics.mean(input_tokens) if input_tokens else None,
+        "output_tokens": statistics.mean(output_tokens) if output_tokens else None,
+    }
+
+
+def cell(value: Optional[float], width: int) -> str:
+    """Right-align a table value, with "-" for missing ones."""
+    return f"{'-':>{width}}" if value is None else f"{value:>{width},.0f}"
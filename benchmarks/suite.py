@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Benchmark Suite
+Per-stage throughput and allocation benchmarks for the response path, with
+JSON results and baseline comparison. Needs no AWS access.
+
+Usage:
+    python3 -m benchmarks.suite --output results.json
+    python3 -m benchmarks.suite --baseline results.json --threshold 0.10
+    python3 -m benchmarks.suite --corpus-dir recorded/ --stage process_response
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postprocessing
+from benchmarks.corpus import BOOKS, standard_corpus
+from recommendations import parse_recommendations
+
+# name -> (prepare raw agent output into the stage's input, run the stage)
+STAGES: Dict[str, Tuple[Callable[[str], Any], Callable[[Any], Any]]] = {
+    "clean_agent_output": (lambda raw: raw, postprocessing.clean_agent_output),
+    "add_missing_links": (postprocessing.clean_agent_output, postprocessing.add_missing_links),
+    "repair_amazon_urls": (lambda raw: postprocessing.add_missing_links(postprocessing.clean_agent_output(raw)),
+                           postprocessing.repair_amazon_urls),
+    "process_response": (lambda raw: raw, postprocessing.process_response),
+    "render_response_html": (postprocessing.process_response, postprocessing.render_response_html),
+    "parse_recommendations": (postprocessing.process_response, parse_recommendations),
+    "recommendations_to_html": (lambda raw: parse_recommendations(postprocessing.process_response(raw)),
+                                lambda recommendations: recommendations.to_html()),
+}
+
+
+def load_corpus(corpus_dir: Optional[str]) -> Dict[str, str]:
+    """Synthetic responses, plus recorded ones (*.txt) from corpus_dir if given."""
+    corpus = standard_corpus()
+    if corpus_dir:
+        for filename in sorted(os.listdir(corpus_dir)):
+            if filename.endswith(".txt"):
+                with open(os.path.join(corpus_dir, filename), encoding="utf-8") as f:
+                    corpus[f"recorded_{filename[:-4]}"] = f.read()
+    return corpus
+
+
+def time_calls(func: Callable[[], Any], min_time: float, repeat: int = 5) -> float:
+    """Return calls per second for func: the best of repeat runs of min_time each."""
+    timer = timeit.Timer(func)
+    number, elapsed = 1, timer.timeit(1)
+    while elapsed < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+        elapsed = timer.timeit(number)
+    # The fastest run is the one least disturbed by the rest of the machine
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number))
+    return number / best
+
+
+def measure_allocations(func: Callable[[], Any], calls: int = 10) -> Tuple[int, int]:
+    """Return (peak bytes allocated, bytes still held afterwards) per call."""
+    func()  # Warm caches so one-time allocations are not counted
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            result = func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+            del result
+        retained = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return peak, max(0, retained) // calls
+
+
+def bench_stage(func: Callable[[Any], Any], stage_input: Any, size: int,
+                min_time: float, allocations: bool) -> Dict[str, float]:
+    """Benchmark one stage on one input."""
+    call = lambda: func(stage_input)
+    calls_per_sec = time_calls(call, min_time)
+    result = {
+        "bytes": size,
+        "calls_per_sec": round(calls_per_sec, 1),
+        "mb_per_sec": round(calls_per_sec * size / 1e6, 3),
+    }
+    if allocations:
+        peak, retained = measure_allocations(call)
+        result["peak_alloc_bytes"] = peak
+        result["retained_bytes"] = retained
+    return result
+
+
+def bench_amazon_search_url(min_time: float, allocations: bool) -> Dict[str, float]:
+    """Benchmark URL generation over the catalog titles."""
+    pairs = [(title, author) for title, author, _, _ in BOOKS]
+    size = sum(len(f"{title} {author}".encode("utf-8")) for title, author in pairs)
+    return bench_stage(lambda items: [postprocessing.amazon_search_url(*pair) for pair in items],
+                       pairs, size, min_time, allocations)
+
+
+def run_suite(corpus: Dict[str, str], stage_filter: Optional[str],
+              min_time: float, allocations: bool) -> Dict[str, Dict[str, float]]:
+    """Run every selected stage over every response; keys are "stage/response"."""
+    results: Dict[str, Dict[str, float]] = {}
+
+    if not stage_filter or stage_filter in "amazon_search_url":
+        results["amazon_search_url/catalog"] = bench_amazon_search_url(min_time, allocations)
+        print(f"  amazon_search_url/catalog: {results['amazon_search_url/catalog']['calls_per_sec']:,.0f} calls/s")
+
+    for stage, (prepare, func) in STAGES.items():
+        if stage_filter and stage_filter not in stage:
+            continue
+        for name, raw in corpus.items():
+            key = f"{stage}/{name}"
+            results[key] = bench_stage(func, prepare(raw), len(raw.encode("utf-8")), min_time, allocations)
+            line = f"  {key}: {results[key]['mb_per_sec']:.2f} MB/s"
+            if allocations:
+                line += f", peak {results[key]['peak_alloc_bytes'] / 1024:.1f} KiB"
+            print(line)
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Return a description of every metric that regressed past threshold."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+
+        if current["calls_per_sec"] < previous["calls_per_sec"] * (1 - threshold):
+            change = current["calls_per_sec"] / previous["calls_per_sec"] - 1
+            regressions.append(f"{key}: throughput {change:+.1%} "
+                               f"({previous['calls_per_sec']:,.0f} -> {current['calls_per_sec']:,.0f} calls/s)")
+
+        if "peak_alloc_bytes" in current and "peak_alloc_bytes" in previous:
+            # Ignore noise on stages that barely allocate
+            allowed = max(previous["peak_alloc_bytes"] * (1 + threshold), previous["peak_alloc_bytes"] + 1024)
+            if current["peak_alloc_bytes"] > allowed:
+                regressions.append(f"{key}: peak allocation {previous['peak_alloc_bytes']:,} -> "
+                                   f"{current['peak_alloc_bytes']:,} bytes")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the BookBuddy response path")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved earlier with --output")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed slowdown or allocation growth as a fraction (default: 0.10)")
+    parser.add_argument("--stage", help="Only run stages whose name contains this text")
+    parser.add_argument("--corpus-dir", help="Directory of recorded agent responses (*.txt) to add")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Seconds per timing run; the best of five runs is kept (default: 0.05)")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip allocation measurements")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_dir)
+    print(f"🏁 Benchmarking {len(corpus)} responses...")
+    results = run_suite(corpus, args.stage, args.min_time, not args.no_alloc)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "threshold": args.threshold,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"💾 Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
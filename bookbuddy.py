@@ -4,11 +4,107 @@ BookBuddy - AI Reading Companion
 A Bedrock Agent that recommends books based on user preferences.
 """
 
-import boto3
+import codecs
+import hashlib
 import json
+import os
+import random
 import time
-import re
-from typing import Optional, Dict, Any
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Iterator, Iterable, Tuple, Union
+
+from botocore.exceptions import ClientError
+
+from agent_resolver import AgentResolver
+from agent_trace import AgentTrace
+from aws_clients import get_client
+from cassette import CassetteStore, RecordingRuntime, ReplayRuntime
+from metrics import PhaseMetrics, PhaseTimer
+from postprocessing import amazon_search_url, add_missing_links, clean_agent_output, repair_amazon_urls
+from query_index import SimilarQueryIndex
+from rate_governor import CHARS_PER_TOKEN, RateGovernor, default_governor
+from recommendations import (
+    Book,
+    JsonRecommendationRenderer,
+    Recommendations,
+    RecommendationParser,
+    parse_recommendations,
+)
+from response_cache import ResponseCache
+from session_pool import SessionPool
+from single_flight import SharedCallCancelled, SingleFlight
+from step_graph import StepGraph, StepFailed
+from waiters import (
+    STABLE_AGENT_STATUSES,
+    WaitResult,
+    wait_for_agent_status,
+    wait_for_agent_deleted,
+    wait_for_alias_status,
+    wait_for_alias_deleted,
+    wait_for_role,
+)
+
+
+# Local file remembering a provisioned agent so warm restarts skip setup
+DEFAULT_STATE_PATH = ".bookbuddy_state.json"
+# Used instead by the separate agent behind output_format="json"
+JSON_STATE_PATH = ".bookbuddy_state-json.json"
+
+# "agent" goes through Bedrock Agents; "direct" streams from the model with
+# the agent's instruction as the system prompt, skipping orchestration
+BACKENDS = ("agent", "direct")
+
+# "markdown" has the model write the finished answer; "json" has it write
+# only the book records, with links and formatting added locally
+OUTPUT_FORMATS = ("markdown", "json")
+
+JSON_INSTRUCTION = """You are BookBuddy. Your ONLY job is to recommend specific books.
+
+When someone asks for books, immediately recommend 2-3 specific books. Do NOT ask questions back.
+
+Reply with one JSON object and nothing else:
+{"intro": "one short sentence", "books": [{"title": "...", "author": "...", "blurb": "one-line description"}]}
+
+Only when the user asks for summaries, give each book a "summary" of 2-3 sentences about its plot, main themes, or key content.
+Do not write links, Markdown or emoji; they are added for you.
+
+You are BookBuddy, not Amazon Titan."""
+
+THROTTLING_ERROR_CODES = {
+    "throttlingexception",
+    "toomanyrequestsexception",
+    "servicequotaexceededexception",
+}
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Return True if a Bedrock error means the request was throttled."""
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        return code.lower() in THROTTLING_ERROR_CODES
+    return False
+
+
+class ModelAccessError(Exception):
+    """The foundation model is not available to this account."""
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one query in a chat_many() batch."""
+    index: int
+    query: str
+    include_summary: bool
+    response: Optional[str] = None
+    error: Optional[Exception] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 class BookBuddyAgent:
@@ -18,17 +114,84 @@ class BookBuddyAgent:
                  agent_name: str = "BookBuddy",
                  foundation_model: str = "anthropic.claude-3-haiku-20240307-v1:0",
                  alias_name: str = "BookBuddy",
-                 region: str = "us-east-1"):
+                 region: str = "us-east-1",
+                 cache: Optional[ResponseCache] = None,
+                 query_index: Optional[SimilarQueryIndex] = None,
+                 state_path: Optional[str] = DEFAULT_STATE_PATH,
+                 metrics: Optional[PhaseMetrics] = None,
+                 trace: bool = False,
+                 runtime: Optional[Any] = None,
+                 coalesce: bool = True,
+                 sessions: Optional[SessionPool] = None,
+                 backend: str = "agent",
+                 max_tokens: int = 1024,
+                 output_format: str = "markdown",
+                 governor: Optional[RateGovernor] = None,
+                 throttle_retries: int = 3,
+                 throttle_backoff_base: float = 1.0,
+                 throttle_backoff_max: float = 30.0):
+        
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of: {', '.join(OUTPUT_FORMATS)}")
         
         self.agent_name = agent_name
         self.foundation_model = foundation_model
         self.alias_name = alias_name
         self.region = region
+        self.backend = backend
+        self.max_tokens = max_tokens
+        self.output_format = output_format
+        
+        # Optional response cache shared by chat() and chat_stream(), with a
+        # near-duplicate index so paraphrased queries reuse cached answers
+        self.cache = cache
+        self.query_index = query_index
+        
+        # Shared AWS clients (pooled connections are reused across agents)
+        self.bedrock = get_client("bedrock-agent", region)
+        # A cassette.RecordingRuntime or ReplayRuntime can stand in for the
+        # runtime client to record agent streams or serve them offline
+        self.runtime = runtime if runtime is not None else get_client("bedrock-agent-runtime", region)
+        # Streaming model API, used by the "direct" backend
+        self.model_runtime = get_client("bedrock-runtime", region)
+        self.iam = get_client("iam")
+        
+        # Cached name -> ID index for agents and aliases
+        self.resolver = AgentResolver(self.bedrock)
+        
+        # Saved provisioning state (None disables it)
+        self.state_path = state_path
+        
+        # How long each provisioning wait took, keyed by phase, and the
+        # (start offset, duration) of each initialize() step
+        self.phase_timings: Dict[str, float] = {}
+        self.step_timings: Dict[str, Tuple[float, float]] = {}
         
-        # Initialize AWS clients
-        self.bedrock = boto3.client("bedrock-agent", region_name=region)
-        self.runtime = boto3.client("bedrock-agent-runtime", region_name=region)
-        self.iam = boto3.client("iam")
+        # Per-phase latency histograms for initialize() and chat requests
+        self.metrics = metrics if metrics is not None else PhaseMetrics()
+        
+        # Trace mode asks the agent for its orchestration traces (chat() and
+        # chat_stream() can override it per request); the most recent traced
+        # requests are kept here with their answers
+        self.trace = trace
+        self.traces: "deque[AgentTrace]" = deque(maxlen=100)
+        
+        # Concurrent requests for the same query share one agent call
+        self.single_flight: Optional[SingleFlight] = SingleFlight() if coalesce else None
+        
+        # One agent session per user, expiring with the agent's idle TTL
+        self.sessions = sessions if sessions is not None else SessionPool()
+        # The provisioned agent forgets sessions after the same idle time
+        self.idle_session_ttl = int(self.sessions.idle_ttl)
+        
+        # Process-wide pacing per model ID; throttled sends are retried after it backs off
+        self.governor = governor if governor is not None else default_governor()
+        self.throttle_retries = throttle_retries
+        # Backoff between retries for models the governor does not pace
+        self.throttle_backoff_base = throttle_backoff_base
+        self.throttle_backoff_max = throttle_backoff_max
         
         # Agent properties
         self.agent_id: Optional[str] = None
@@ -80,6 +243,85 @@ A young shepherd boy travels from Spain to Egypt in search of treasure, learning
 🛒 Buy: https://amazon.com/s?k=The+Alchemist+Paulo+Coelho
 
 You are BookBuddy, not Amazon Titan. Just recommend books with purchase links."""
+        
+        # The compact format changes the agent's instruction, so it gets its
+        # own agent, alias and saved state; otherwise deployments using the
+        # two formats would keep rewriting each other's agent. Being part of
+        # config_version also keeps cached answers apart.
+        if output_format == "json":
+            self.instruction = JSON_INSTRUCTION
+            self.agent_name = f"{agent_name}-json"
+            self.alias_name = f"{alias_name}-json"
+            if state_path == DEFAULT_STATE_PATH:
+                self.state_path = JSON_STATE_PATH
+
+    @property
+    def config_version(self) -> str:
+        """Fingerprint of the model and instruction, used to version cached answers."""
+        raw = f"{self.foundation_model}\n{self.instruction}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def state_fingerprint(self) -> Dict[str, str]:
+        """Configuration that must match for saved state to be reused."""
+        return {
+            "agent_name": self.agent_name,
+            "alias_name": self.alias_name,
+            "region": self.region,
+            "foundation_model": self.foundation_model,
+            "instruction_hash": hashlib.sha256(self.instruction.encode("utf-8")).hexdigest(),
+            "idle_session_ttl": str(self.idle_session_ttl),
+        }
+
+    def load_state(self) -> bool:
+        """Restore agent and alias IDs if the saved state matches this configuration."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return False
+        
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable state file {self.state_path}: {e}")
+            return False
+        
+        if state.get("fingerprint") != self.state_fingerprint():
+            print("🔄 Saved agent state is out of date, running full setup")
+            return False
+        
+        if not state.get("agent_id") or not state.get("alias_id"):
+            return False
+        
+        self.agent_id = state["agent_id"]
+        self.alias_id = state["alias_id"]
+        self.role_arn = state.get("role_arn")
+        return True
+
+    def save_state(self) -> None:
+        """Persist agent and alias IDs with the configuration fingerprint."""
+        if not self.state_path:
+            return
+        
+        state = {
+            "agent_id": self.agent_id,
+            "alias_id": self.alias_id,
+            "role_arn": self.role_arn,
+            "fingerprint": self.state_fingerprint(),
+            "saved_at": time.time(),
+        }
+        
+        # Write atomically so a crash never leaves a truncated file behind
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"⚠️ Could not save agent state: {e}")
+
+    def clear_state(self) -> None:
+        """Delete the saved state so the next initialize() runs the full setup."""
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
 
     def verify_model_access(self) -> bool:
         """Verify that the foundation model is available and accessible."""
@@ -87,7 +329,7 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
         
         try:
             # Check if model is listed
-            bedrock_client = boto3.client("bedrock", region_name=self.region)
+            bedrock_client = get_client("bedrock", self.region)
             models = bedrock_client.list_foundation_models()
             available_models = [model['modelId'] for model in models['modelSummaries']]
             
@@ -96,7 +338,7 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
                 return False
             
             # Test model access
-            bedrock_runtime = boto3.client("bedrock-runtime", region_name=self.region)
+            bedrock_runtime = get_client("bedrock-runtime", self.region)
             
             if "anthropic" in self.foundation_model:
                 body = json.dumps({
@@ -122,6 +364,17 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
             print(f"3. Enable '{self.foundation_model}'")
             return False
 
+    def _record_wait(self, phase: str, result: WaitResult) -> WaitResult:
+        """Remember how long a provisioning phase waited."""
+        self.phase_timings[phase] = self.phase_timings.get(phase, 0.0) + result.elapsed
+        return result
+
+    def _require_model_access(self) -> bool:
+        """Step wrapper that fails the initialization graph without model access."""
+        if not self.verify_model_access():
+            raise ModelAccessError(self.foundation_model)
+        return True
+
     def ensure_iam_role(self) -> str:
         """Create or get the IAM role for the Bedrock agent."""
         role_name = f"{self.agent_name}-Role"
@@ -146,11 +399,12 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
             print(f"✅ Created IAM role: {role_arn}")
             
             # Attach necessary policies
+            policy_arn = 'arn:aws:iam::aws:policy/AmazonBedrockFullAccess'
             self.iam.attach_role_policy(
                 RoleName=role_name,
-                PolicyArn='arn:aws:iam::aws:policy/AmazonBedrockFullAccess'
+                PolicyArn=policy_arn
             )
-            time.sleep(5)  # Wait for propagation
+            self._record_wait("iam_role", wait_for_role(self.iam, role_name, policy_arn))
             
         except self.iam.exceptions.EntityAlreadyExistsException:
             # Role already exists
@@ -160,22 +414,43 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
         
         return role_arn
 
-    def setup_agent(self) -> tuple[str, bool]:
+    def lookup_iam_role(self) -> Optional[str]:
+        """Return the ARN of the agent's IAM role if it already exists."""
+        try:
+            role_response = self.iam.get_role(RoleName=f"{self.agent_name}-Role")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "NoSuchEntity":
+                return None
+            raise
+        return role_response['Role']['Arn']
+
+    def find_agent(self) -> Optional[Dict[str, Any]]:
+        """Look up the agent by name and return its details, or None if missing."""
+        agent_id = self.resolver.find_agent_id(self.agent_name)
+        if not agent_id:
+            return None
+        
+        print(f"✅ Found existing agent: {self.agent_name} (ID: {agent_id})")
+        return self.bedrock.get_agent(agentId=agent_id)['agent']
+
+    def setup_agent(self) -> Tuple[str, bool]:
         """Create or update the Bedrock agent."""
-        # Check for existing agent
-        agents_response = self.bedrock.list_agents()
-        agents = agents_response.get("agentSummaries", [])
-        existing_agent = next((a for a in agents if a['agentName'] == self.agent_name), None)
+        return self.sync_agent(self.find_agent())
+
+    def sync_agent(self, agent_details: Optional[Dict[str, Any]], role_arn: Optional[str] = None) -> Tuple[str, bool]:
+        """Create the agent, or update it if its configuration drifted.
         
-        if existing_agent:
-            agent_id = existing_agent['agentId']
-            print(f"✅ Found existing agent: {self.agent_name} (ID: {agent_id})")
+        agent_details is the result of find_agent(); role_arn, if known from
+        lookup_iam_role(), saves creating or fetching the role again.
+        """
+        if agent_details:
+            agent_id = agent_details['agentId']
             
             # Check if update is needed
-            agent_details = self.bedrock.get_agent(agentId=agent_id)
-            current_model = agent_details['agent'].get('foundationModel')
-            current_role = agent_details['agent'].get('agentResourceRoleArn')
-            current_instruction = agent_details['agent'].get('instruction', '')
+            current_model = agent_details.get('foundationModel')
+            current_role = agent_details.get('agentResourceRoleArn')
+            current_instruction = agent_details.get('instruction', '')
+            current_idle_ttl = agent_details.get('idleSessionTTLInSeconds')
             
             needs_update = False
             changes = []
@@ -192,11 +467,15 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
                 needs_update = True
                 changes.append("Instruction updated")
             
+            if current_idle_ttl != self.idle_session_ttl:
+                needs_update = True
+                changes.append(f"Idle session TTL: {current_idle_ttl} → {self.idle_session_ttl}s")
+            
             if needs_update:
                 print(f"🔧 Updating agent - Changes: {', '.join(changes)}")
                 
                 if not current_role:
-                    self.role_arn = self.ensure_iam_role()
+                    self.role_arn = role_arn or self.ensure_iam_role()
                 else:
                     self.role_arn = current_role
                 
@@ -206,13 +485,13 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
                     agentName=self.agent_name,
                     foundationModel=self.foundation_model,
                     agentResourceRoleArn=self.role_arn,
-                    instruction=self.instruction
+                    instruction=self.instruction,
+                    idleSessionTTLInSeconds=self.idle_session_ttl
                 )
                 print("✅ Agent updated with new configuration")
                 
-                # Wait for update to propagate
-                print("⏳ Waiting for update to propagate...")
-                time.sleep(3)
+                # Wait for the update to finish before preparing
+                self._record_wait("agent_update", wait_for_agent_status(self.bedrock, agent_id, STABLE_AGENT_STATUSES))
                 
                 return agent_id, True  # Return that update happened
             else:
@@ -222,16 +501,20 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
         else:
             # Create new agent
             print(f"🔧 Creating new agent: {self.agent_name}")
-            self.role_arn = self.ensure_iam_role()
+            self.role_arn = role_arn or self.ensure_iam_role()
             
             agent = self.bedrock.create_agent(
                 agentName=self.agent_name,
                 foundationModel=self.foundation_model,
                 agentResourceRoleArn=self.role_arn,
-                instruction=self.instruction
+                instruction=self.instruction,
+                idleSessionTTLInSeconds=self.idle_session_ttl
             )
             agent_id = agent["agent"]["agentId"]
             print(f"✅ Agent created: {agent_id}")
+            self.resolver.invalidate()
+            
+            self._record_wait("agent_create", wait_for_agent_status(self.bedrock, agent_id, STABLE_AGENT_STATUSES))
         
         return agent_id, True  # New agent created
 
@@ -243,226 +526,713 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
         for attempt in range(max_retries):
             try:
                 self.bedrock.prepare_agent(agentId=agent_id)
-                print("✅ Agent prepared successfully")
-                time.sleep(3)
-                
-                # Verify agent status
-                agent_details = self.bedrock.get_agent(agentId=agent_id)
-                status = agent_details['agent'].get('agentStatus')
-                
-                if status == 'PREPARED':
-                    print("✅ Agent is ready")
-                    break
-                elif status == 'PREPARING':
-                    print("⏳ Agent still preparing...")
-                    time.sleep(5)
-                    
+                break
             except Exception as e:
                 print(f"❌ Preparation attempt {attempt + 1} failed: {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(5)
+                    # Usually a create/update still in flight; wait for it to settle
+                    wait_for_agent_status(self.bedrock, agent_id, STABLE_AGENT_STATUSES)
                 else:
                     raise
+        
+        result = self._record_wait("agent_prepare", wait_for_agent_status(self.bedrock, agent_id, {"PREPARED"}))
+        print(f"✅ Agent is ready (prepared in {result.elapsed:.1f}s)")
 
     def setup_alias(self, agent_id: str) -> str:
         """Create or find the agent alias."""
         print(f"🔧 Setting up alias: {self.alias_name}")
         
         # Check existing aliases first
+        alias_id = self.resolver.find_alias_id(agent_id, self.alias_name)
+        if alias_id:
+            print(f"✅ Using existing alias: {self.alias_name} (ID: {alias_id})")
+            return alias_id
+        
+        print(f"📋 Found {len(self.resolver.aliases(agent_id))} existing aliases for this agent")
+        
+        # No existing alias found, try to create new one
+        print(f"🆕 Creating new alias: {self.alias_name}")
         try:
-            aliases_response = self.bedrock.list_agent_aliases(agentId=agent_id)
-            aliases = aliases_response.get("agentAliases", [])
-            
-            print(f"📋 Found {len(aliases)} existing aliases for this agent")
-            
-            # Look for existing alias
-            for alias in aliases:
-                if alias.get('agentAliasName') == self.alias_name:
-                    alias_id = alias['agentAliasId']
-                    print(f"✅ Using existing alias: {self.alias_name} (ID: {alias_id})")
-                    return alias_id
-            
-            # No existing alias found, try to create new one
-            print(f"🆕 Creating new alias: {self.alias_name}")
             alias = self.bedrock.create_agent_alias(
                 agentId=agent_id,
                 agentAliasName=self.alias_name
             )
-            alias_id = alias["agentAlias"]["agentAliasId"]
-            print(f"✅ Created new alias: {self.alias_name} (ID: {alias_id})")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConflictException":
+                raise
+            # Created concurrently by someone else; re-read the alias listing
+            self.resolver.invalidate(agent_id)
+            alias_id = self.resolver.find_alias_id(agent_id, self.alias_name)
+            if not alias_id:
+                raise
+            print(f"✅ Found existing alias: {self.alias_name} (ID: {alias_id})")
             return alias_id
-            
-        except Exception as e:
-            if "ConflictException" in str(e) and "already exists" in str(e):
-                # Extract alias ID from error message
-                alias_id_match = re.search(r'id:\s*([A-Z0-9]+)', str(e))
-                if alias_id_match:
-                    alias_id = alias_id_match.group(1)
-                    print(f"✅ Found existing alias: {self.alias_name} (ID: {alias_id})")
-                    return alias_id
-            raise
+        
+        alias_id = alias["agentAlias"]["agentAliasId"]
+        print(f"✅ Created new alias: {self.alias_name} (ID: {alias_id})")
+        self.resolver.invalidate(agent_id)
+        
+        self._record_wait("alias_create", wait_for_alias_status(self.bedrock, agent_id, alias_id, {"PREPARED"}))
+        return alias_id
+
+    def initialize(self, force: bool = False) -> bool:
+        """Initialize the complete BookBuddy agent setup.
+        
+        When saved state matches the current configuration the agent is
+        reused as-is; pass force=True to always run the full setup.
+        """
+        timer = PhaseTimer()
+        ok = False
+        try:
+            ok = self._initialize(force, timer)
+            return ok
+        finally:
+            timer.add("total", timer.total())
+            waits = {phase: round(seconds * 1000, 3) for phase, seconds in self.phase_timings.items()}
+            self.metrics.record("initialize", timer.phases, ok=ok, waits_ms=waits)
 
-    def initialize(self) -> bool:
-        """Initialize the complete BookBuddy agent setup."""
+    def _initialize(self, force: bool, timer: PhaseTimer) -> bool:
         try:
             print(f"🚀 Initializing BookBuddy Agent...")
             print(f"Region: {self.region}")
             print(f"Model: {self.foundation_model}")
             
-            # Step 1: Verify model access
-            if not self.verify_model_access():
-                return False
+            if self.backend == "direct":
+                # Nothing to provision: the model just has to be reachable
+                with timer.phase("model_access"):
+                    ready = self.verify_model_access()
+                if ready:
+                    print("🎉 BookBuddy is ready (direct model backend)!")
+                return ready
             
-            # Step 2: Setup agent
-            self.agent_id, agent_updated = self.setup_agent()
+            with timer.phase("load_state"):
+                reused = not force and self.load_state()
+            if reused:
+                print(f"⚡ Reusing saved agent {self.agent_id} (alias {self.alias_id})")
+                print("🎉 BookBuddy is ready!")
+                return True
             
-            # Step 3: Prepare agent (always prepare if updated)
-            if agent_updated:
-                print("🔄 Agent was updated, forcing re-preparation...")
-                time.sleep(5)  # Wait longer for update to propagate
-                
-                # Force re-preparation by checking status first
-                try:
-                    agent_details = self.bedrock.get_agent(agentId=self.agent_id)
-                    current_status = agent_details['agent'].get('agentStatus')
-                    print(f"Current agent status: {current_status}")
-                except Exception as e:
-                    print(f"Could not check agent status: {e}")
-                    
-            self.prepare_agent(self.agent_id)
+            # Model check, role lookup and agent lookup are independent and run
+            # concurrently; the remaining steps depend on them in order
+            graph = StepGraph()
+            graph.add("model_access", self._require_model_access)
+            graph.add("role_lookup", self.lookup_iam_role)
+            graph.add("agent_lookup", self.find_agent)
+            graph.add("agent_setup",
+                      lambda model_access, role_lookup, agent_lookup: self.sync_agent(agent_lookup, role_lookup),
+                      depends_on=["model_access", "role_lookup", "agent_lookup"])
+            graph.add("agent_prepare",
+                      lambda agent_setup: self.prepare_agent(agent_setup[0]),
+                      depends_on=["agent_setup"])
+            graph.add("alias_setup",
+                      lambda agent_setup, agent_prepare: self.setup_alias(agent_setup[0]),
+                      depends_on=["agent_setup", "agent_prepare"])
+            
+            try:
+                results = graph.run()
+            finally:
+                self.step_timings = dict(graph.timings)
+                for step, (_, duration) in graph.timings.items():
+                    timer.add(step, duration)
+                print("⏱️ Initialization steps:")
+                for line in graph.timing_report():
+                    print(f"   {line}")
             
-            # Step 4: Setup alias
-            self.alias_id = self.setup_alias(self.agent_id)
+            self.agent_id = results["agent_setup"][0]
+            self.alias_id = results["alias_setup"]
+            self.save_state()
             
             print("🎉 BookBuddy is ready!")
+            if self.phase_timings:
+                print("⏱️ Provisioning waits: " + ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in self.phase_timings.items()))
             
             # Quick test to verify the agent is working properly
             print("🧪 Testing agent response...")
+            test_start = time.perf_counter()
             try:
-                test_response = self.chat("Test: recommend one motivational book", "test-session")
+                # Bypass the response cache so the live agent is actually exercised
+                test_response = self.clean_response("".join(self._stream("Test: recommend one motivational book", "test-session", False)))
                 if test_response and not test_response.startswith("❌") and ("book" in test_response.lower() or "recommend" in test_response.lower()):
                     print("✅ Agent test passed - responding appropriately")
                 else:
                     print(f"⚠️ Agent test response: {test_response[:200]}...")
             except Exception as test_error:
                 print(f"⚠️ Agent test failed: {test_error}")
+            timer.add("agent_test", time.perf_counter() - test_start)
             
             return True
             
+        except StepFailed as e:
+            if isinstance(e.error, ModelAccessError):
+                return False
+            print(f"❌ Initialization failed: {e}")
+            return False
+            
         except Exception as e:
             print(f"❌ Initialization failed: {e}")
             return False
 
+    def delete_agent(self, agent_id: str) -> None:
+        """Delete the agent and its aliases, waiting until both are gone."""
+        aliases = self.resolver.aliases(agent_id)
+        for alias in aliases:
+            alias_id = alias['agentAliasId']
+            print(f"🗑️ Deleting alias: {alias.get('agentAliasName', alias_id)}")
+            self.bedrock.delete_agent_alias(agentId=agent_id, agentAliasId=alias_id)
+        for alias in aliases:
+            self._record_wait("alias_delete", wait_for_alias_deleted(self.bedrock, agent_id, alias['agentAliasId']))
+        
+        print(f"🗑️ Deleting agent: {agent_id}")
+        self.bedrock.delete_agent(agentId=agent_id)
+        self._record_wait("agent_delete", wait_for_agent_deleted(self.bedrock, agent_id))
+        self.resolver.invalidate(agent_id)
+
     def generate_amazon_url(self, title: str, author: str) -> str:
         """Generate Amazon search URL for a book."""
-        import re
+        return amazon_search_url(title, author)
+
+    def enhance_response_with_links(self, response: str) -> str:
+        """Enhance response by ensuring Amazon links are properly formatted."""
+        return add_missing_links(response)
+
+    def build_prompt(self, user_input: str, include_summary: bool = False) -> str:
+        """Build the text sent to the agent for a user request."""
+        # Modify the input to request summary if needed
+        if include_summary and self.output_format == "json":
+            return f"{user_input}. Include a summary for each book."
+        if include_summary:
+            return f"{user_input}. IMPORTANT: For each book, after the description, add a section that starts with '📖 What it's about:' followed by 2-3 sentences explaining the book's main content, plot, or key themes."
+        return user_input
+
+    def clean_response(self, output_text: str, timer: Optional[PhaseTimer] = None) -> str:
+        """Clean up raw agent output and make sure it carries purchase links."""
+        if timer is None:
+            timer = PhaseTimer()
+        # Same steps as postprocessing.process_response, timed separately
+        with timer.phase("cleanup"):
+            cleaned = clean_agent_output(output_text)
+        with timer.phase("link_enhancement"):
+            return repair_amazon_urls(add_missing_links(cleaned))
+
+    def _cache_key(self, user_input: str, include_summary: bool) -> Optional[str]:
+        """Return the cache key for a request, or None when caching is disabled."""
+        if self.cache is None:
+            return None
+        return self.cache.make_key(user_input, include_summary, self.config_version)
+
+    def _index_namespace(self, include_summary: bool) -> str:
+        """Partition the query index by agent version and summary flag."""
+        return f"{self.config_version}:{int(include_summary)}"
+
+    def _lookup_cached(self, user_input: str, include_summary: bool) -> Optional[str]:
+        """Return a cached answer for this query or a near-duplicate of it."""
+        cache_key = self._cache_key(user_input, include_summary)
+        if cache_key is None:
+            return None
         
-        # Clean title and author
-        title = title.strip().strip('"').strip("'").strip()
-        author = author.strip().strip('"').strip("'").strip()
+        cached = self.cache.get(cache_key)
+        if cached is not None or self.query_index is None:
+            return cached
         
-        # Remove unwanted characters and format for URL
-        search_query = f"{title} {author}"
-        # Remove special characters that might cause issues
-        search_query = re.sub(r'[^\w\s]', '', search_query)
-        # Replace spaces with +
-        search_query = search_query.replace(" ", "+")
-        # Remove multiple + signs
-        search_query = re.sub(r'\++', '+', search_query)
-        # Remove leading/trailing +
-        search_query = search_query.strip('+')
+        match = self.query_index.lookup(user_input, self._index_namespace(include_summary))
+        if match is None:
+            return None
         
-        return f"https://amazon.com/s?k={search_query}"
+        cached = self.cache.get(match.payload)
+        if cached is not None:
+            print(f"♻️ Reusing answer for '{match.matched_query}' ({match.reason})")
+        return cached
 
-    def enhance_response_with_links(self, response: str) -> str:
-        """Enhance response by ensuring Amazon links are properly formatted."""
-        import re
+    def _store_cached(self, user_input: str, include_summary: bool, response: str) -> None:
+        """Cache a complete answer and index its query for near-duplicate lookups."""
+        cache_key = self._cache_key(user_input, include_summary)
+        if cache_key is None:
+            return
         
-        # Look for book patterns and ensure they have proper Amazon links
-        # This is a backup in case the AI doesn't include links
-        book_pattern = r'([*]{0,2})([^*\n]+?)([*]{0,2})\s+by\s+([^-–\n]+?)(?:\s*[-–]\s*([^\n]+?))?(?:\n|$)'
+        self.cache.put(cache_key, response)
+        if self.query_index is not None:
+            self.query_index.add(user_input, cache_key, self._index_namespace(include_summary))
+
+    def _has_context(self, session_id: str) -> bool:
+        """True if the agent remembers earlier turns of this session.
         
-        def add_amazon_link(match):
-            title = match.group(2).strip()
-            author = match.group(4).strip().rstrip('-–').strip()  # Remove trailing dashes
-            description = match.group(5) if match.group(5) else ""
-            
-            # Clean title and author of any unwanted characters
-            title = title.strip().strip('-–').strip()
-            author = author.strip().strip('-–').strip()
-            
-            amazon_url = self.generate_amazon_url(title, author)
+        Such a request may be a follow-up ("more like the second one"), so
+        its answer is neither served from nor stored in the cache, and it
+        is not shared with other sessions' in-flight calls. The direct
+        backend keeps no history.
+        """
+        return self.backend == "agent" and self.sessions.has_history(session_id)
+
+    def _record_chat(self, timer: PhaseTimer, session_id: str, include_summary: bool,
+                     cached: bool, error: Optional[Exception] = None,
+                     trace: Optional[AgentTrace] = None, coalesced: bool = False) -> None:
+        """Record the phases of one chat request, and its agent steps when traced."""
+        timer.add("total", timer.total())
+        fields: Dict[str, Any] = {"session_id": session_id, "include_summary": include_summary,
+                                  "cached": cached, "coalesced": coalesced, "backend": self.backend}
+        fields.update(timer.fields)
+        if error is not None:
+            fields["error"] = type(error).__name__
+        elif not cached and not coalesced:
+            # Only this session's own agent call adds to its conversation;
+            # a cache hit or a shared answer never reached its session
+            self.sessions.record_turn(session_id)
+        if trace is not None:
+            steps = trace.step_durations()
+            for step, seconds in steps.items():
+                self.metrics.observe("agent_step", step, seconds)
+            fields["agent_steps_ms"] = {step: round(seconds * 1000, 3) for step, seconds in steps.items()}
+            # Token usage of every model call the agent made, when reported
+            invocations = trace.model_invocations()
+            for name in ("input_tokens", "output_tokens"):
+                counts = [getattr(invocation, name) for invocation in invocations if getattr(invocation, name)]
+                if counts:
+                    fields[name] = sum(counts)
+            self.traces.append(trace)
+        self.metrics.record("chat", timer.phases, **fields)
+
+    def _stream_agent(self, user_input: str, session_id: str, include_summary: bool,
+                      timer: Optional[PhaseTimer] = None,
+                      trace: Optional[AgentTrace] = None) -> Iterator[str]:
+        """Invoke the agent and yield decoded text chunks as they arrive.
+        
+        With a timer, records prompt_build, request_send, first_chunk (from
+        the request returning to the first text) and last_chunk (time spent
+        waiting for the rest of the stream, not counting the consumer's).
+        With a trace, asks the agent for traces and adds them to it.
+        """
+        if timer is None:
+            timer = PhaseTimer()
+        
+        with timer.phase("prompt_build"):
+            modified_input = self.build_prompt(user_input, include_summary)
+        
+        print(f"🔍 Sending to agent: {modified_input[:100]}..." if len(modified_input) > 100 else f"🔍 Sending to agent: {modified_input}")
+        
+        try:
+            if trace is not None:
+                trace.start()
+            with timer.phase("request_send"):
+                response = self.runtime.invoke_agent(
+                    agentId=self.agent_id,
+                    agentAliasId=self.alias_id,
+                    sessionId=session_id,
+                    inputText=modified_input,
+                    enableTrace=trace is not None
+                )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ResourceNotFoundException":
+                # The saved agent is gone; make the next initialize() rebuild it
+                self.clear_state()
+            raise
+        
+        yield from self._timed_chunks(self._agent_text(response, trace), timer)
+
+    @staticmethod
+    def _agent_text(response: Dict[str, Any], trace: Optional[AgentTrace]) -> Iterator[str]:
+        """Decode the text of an invoke_agent stream, adding its trace events to trace."""
+        # Decode incrementally so multi-byte characters split across chunks survive
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for event in response.get("completion", []):
+            if "chunk" in event:
+                text = decoder.decode(event["chunk"]["bytes"])
+                if text:
+                    yield text
+            elif "trace" in event and trace is not None:
+                trace.add(event["trace"])
+        if trace is not None:
+            trace.finish()
+        
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    @staticmethod
+    def _timed_chunks(texts: Iterator[str], timer: PhaseTimer) -> Iterator[str]:
+        """Pass text chunks through, recording first_chunk and last_chunk on timer."""
+        sent = resumed = time.perf_counter()
+        first_chunk = False
+        draining = 0.0
+        for text in texts:
+            arrived = time.perf_counter()
+            if first_chunk:
+                draining += arrived - resumed
+            else:
+                first_chunk = True
+                timer.add("first_chunk", arrived - sent)
+            yield text
+            resumed = time.perf_counter()
+        if first_chunk:
+            timer.add("last_chunk", draining + time.perf_counter() - resumed)
+
+    def _model_request(self, prompt: str) -> Dict[str, Any]:
+        """Request body for the direct backend, with the instruction as the system prompt."""
+        if "anthropic" in self.foundation_model:
+            return {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": self.max_tokens,
+                "system": self.instruction,
+                "messages": [{"role": "user", "content": prompt}],
+            }
+        # Titan and other text models take a single prompt
+        return {
+            "inputText": f"{self.instruction}\n\nUser: {prompt}\nBot:",
+            "textGenerationConfig": {"maxTokenCount": self.max_tokens},
+        }
+
+    @staticmethod
+    def _model_text(response: Dict[str, Any], timer: PhaseTimer) -> Iterator[str]:
+        """Yield the text of a model response stream, noting its token usage on timer."""
+        for event in response.get("body", []):
+            if "chunk" not in event:
+                continue
+            payload = json.loads(event["chunk"]["bytes"])
             
-            result = f"📚 **{title}** by {author}"
-            if description:
-                result += f"\n{description}"
-            result += f"\n🛒 Buy: {amazon_url}\n"
+            # Anthropic streams usage in its own events; every model adds
+            # invocation metrics to the last chunk
+            usage = (payload.get("message") or {}).get("usage") or payload.get("usage") or {}
+            if "input_tokens" in usage:
+                timer.fields["input_tokens"] = usage["input_tokens"]
+            if "output_tokens" in usage:
+                timer.fields["output_tokens"] = usage["output_tokens"]
+            invocation_metrics = payload.get("amazon-bedrock-invocationMetrics")
+            if invocation_metrics:
+                timer.fields["input_tokens"] = invocation_metrics.get("inputTokenCount")
+                timer.fields["output_tokens"] = invocation_metrics.get("outputTokenCount")
             
-            return result
+            if payload.get("type") == "content_block_delta":
+                text = (payload.get("delta") or {}).get("text")
+            else:
+                text = payload.get("outputText")
+            if text:
+                yield text
+
+    def _stream_model(self, user_input: str, session_id: str, include_summary: bool,
+                      timer: Optional[PhaseTimer] = None) -> Iterator[str]:
+        """Stream an answer straight from the foundation model (the "direct" backend).
+        
+        Sends the agent's instruction as the system prompt and yields the
+        same kind of text the agent would, so post-processing, caching and
+        the UIs work unchanged. Records the same phases as _stream_agent().
+        Unlike agent sessions, no conversation history is kept: each request
+        stands alone.
+        """
+        if timer is None:
+            timer = PhaseTimer()
+        
+        with timer.phase("prompt_build"):
+            modified_input = self.build_prompt(user_input, include_summary)
+            body = json.dumps(self._model_request(modified_input))
+        
+        print(f"🔍 Sending to model: {modified_input[:100]}..." if len(modified_input) > 100 else f"🔍 Sending to model: {modified_input}")
+        
+        with timer.phase("request_send"):
+            response = self.model_runtime.invoke_model_with_response_stream(
+                modelId=self.foundation_model,
+                body=body,
+                contentType="application/json",
+                accept="application/json"
+            )
+        
+        yield from self._timed_chunks(self._model_text(response, timer), timer)
+        for name in ("input_tokens", "output_tokens"):
+            if timer.fields.get(name):
+                self.metrics.increment(name, timer.fields[name])
+
+    def _stream(self, user_input: str, session_id: str, include_summary: bool,
+                timer: Optional[PhaseTimer] = None,
+                trace: Optional[AgentTrace] = None) -> Iterator[str]:
+        """Stream an answer from the configured backend in the agent's text format."""
+        if self.backend == "direct":
+            # There is no orchestration to trace
+            texts = self._stream_model(user_input, session_id, include_summary, timer)
+        else:
+            texts = self._stream_agent(user_input, session_id, include_summary, timer, trace)
+        if self.output_format == "json":
+            return self._render_json(texts)
+        return texts
+
+    @staticmethod
+    def _render_json(texts: Iterable[str]) -> Iterator[str]:
+        """Turn a streamed JSON answer into Markdown, one finished book at a time."""
+        renderer = JsonRecommendationRenderer()
+        for text in texts:
+            rendered = renderer.feed(text)
+            if rendered:
+                yield rendered
+        rest = renderer.close()
+        if rest:
+            yield rest
+
+    def _used_tokens(self, timer: PhaseTimer, trace: Optional[AgentTrace]) -> Optional[int]:
+        """Tokens a finished request used, if the backend reported them."""
+        counts = [timer.fields.get("input_tokens"), timer.fields.get("output_tokens")]
+        if trace is not None:
+            for invocation in trace.model_invocations():
+                counts.extend([invocation.input_tokens, invocation.output_tokens])
+        used = sum(count for count in counts if count)
+        return used or None
+
+    def _governed(self, user_input: str, session_id: str, include_summary: bool,
+                  timer: PhaseTimer, trace: Optional[AgentTrace]) -> Iterator[str]:
+        """Stream from the backend once the rate governor lets the request through.
+        
+        Waiting for the governor is recorded as the rate_wait phase. A
+        throttled send is reported to the governor and retried after the
+        wait, or after exponential backoff with full jitter when the model
+        is not paced; throttling after text has been yielded is raised as usual.
+        """
+        # Until the model reports usage, assume the whole instruction and a full answer
+        estimate = (len(self.instruction) + len(user_input)) // CHARS_PER_TOKEN + self.max_tokens
+        attempt = 0
+        while True:
+            with timer.phase("rate_wait"):
+                permit = self.governor.acquire(self.foundation_model, estimate)
+            started = False
+            try:
+                for text in self._stream(user_input, session_id, include_summary, timer, trace):
+                    started = True
+                    yield text
+                return
+            except Exception as e:
+                if not is_throttling_error(e):
+                    raise
+                paced = self.governor.throttled(self.foundation_model)
+                self.metrics.increment("throttled_calls")
+                if started or attempt >= self.throttle_retries:
+                    raise
+                attempt += 1
+            finally:
+                permit.settle(self._used_tokens(timer, trace))
+            if not paced:
+                # Nothing paces this model, so back off with full jitter before retrying
+                delay = min(self.throttle_backoff_max, self.throttle_backoff_base * (2 ** (attempt - 1)))
+                with timer.phase("rate_wait"):
+                    time.sleep(random.uniform(0, delay))
+
+    def _shared_stream(self, user_input: str, session_id: str, include_summary: bool,
+                       timer: PhaseTimer, trace: Optional[AgentTrace],
+                       share: bool = True) -> Tuple[Iterator[str], bool]:
+        """Return the agent's chunks for a request and whether another caller's call is shared.
+        
+        While a request for the same normalized query and summary flag is
+        in flight, this attaches to it instead of invoking the agent again.
+        Followers get the leader's answer even though it was asked in
+        another session, so share=False opts a request out.
+        """
+        if self.single_flight is None or not share:
+            return self._governed(user_input, session_id, include_summary, timer, trace), False
+        
+        key = ResponseCache.make_key(user_input, include_summary, self.config_version)
+        call, leader = self.single_flight.join(key)
+        if not leader:
+            self.metrics.increment("coalesced_calls")
+            return call.stream(), True
+        
+        def lead() -> Iterator[str]:
+            error: Optional[Exception] = None
+            try:
+                for text in self._governed(user_input, session_id, include_summary, timer, trace):
+                    call.publish(text)
+                    yield text
+            except Exception as e:
+                error = e
+                raise
+            except GeneratorExit:
+                error = SharedCallCancelled("The request this one was sharing was cancelled")
+                raise
+            finally:
+                self.single_flight.leave(key, call, error)
+        
+        self.metrics.increment("agent_calls")
+        return lead(), False
+
+    def _new_trace(self, user_input: str, session_id: str, trace: Optional[bool]) -> Optional[AgentTrace]:
+        """Start a trace for a request if asked to (None uses the agent's trace setting)."""
+        if trace is None:
+            trace = self.trace
+        return AgentTrace(user_input, session_id) if trace and self.backend == "agent" else None
+
+    def chat_stream(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False,
+                    trace: Optional[bool] = None) -> Iterator[str]:
+        """Send a message to BookBuddy and yield raw response text as it arrives.
+        
+        Errors are raised to the caller. Pass the joined text to
+        clean_response() to get the same result chat() returns. trace
+        overrides the agent's trace setting for this request.
+        """
+        timer = PhaseTimer()
+        shared = not self._has_context(session_id)
+        if not shared:
+            timer.fields["follow_up"] = True
+        with timer.phase("cache_lookup"):
+            cached = self._lookup_cached(user_input, include_summary) if shared else None
+        if cached is not None:
+            self._record_chat(timer, session_id, include_summary, cached=True)
+            yield cached
+            return
         
-        # Only enhance if no Amazon links are already present
-        if "amazon.com" not in response.lower():
-            enhanced = re.sub(book_pattern, add_amazon_link, response, flags=re.MULTILINE)
-            return enhanced
+        trace = self._new_trace(user_input, session_id, trace)
+        stream, coalesced = self._shared_stream(user_input, session_id, include_summary, timer, trace, shared)
+        if coalesced:
+            # The leader caches the answer and keeps the trace
+            for text in stream:
+                yield text
+            self._record_chat(timer, session_id, include_summary, cached=False, coalesced=True)
+            return
         
-        return response
+        chunks = []
+        try:
+            for text in stream:
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            self._record_chat(timer, session_id, include_summary, cached=False, error=e, trace=trace)
+            raise
+        
+        # Only complete answers are cached
+        if self.cache is not None or trace is not None:
+            response = self.clean_response("".join(chunks), timer)
+            if trace is not None:
+                trace.response = response
+            if shared:
+                self._store_cached(user_input, include_summary, response)
+        self._record_chat(timer, session_id, include_summary, cached=False, trace=trace)
 
-    def chat(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False) -> str:
+    def _answer(self, user_input: str, session_id: str, include_summary: bool,
+                trace: Optional[bool] = None) -> str:
+        """Return the final answer for a request, raising on errors."""
+        timer = PhaseTimer()
+        shared = not self._has_context(session_id)
+        if not shared:
+            timer.fields["follow_up"] = True
+        with timer.phase("cache_lookup"):
+            cached = self._lookup_cached(user_input, include_summary) if shared else None
+        if cached is not None:
+            self._record_chat(timer, session_id, include_summary, cached=True)
+            return cached
+        
+        traced = trace
+        trace = self._new_trace(user_input, session_id, traced)
+        stream, coalesced = self._shared_stream(user_input, session_id, include_summary, timer, trace, shared)
+        if coalesced:
+            try:
+                with timer.phase("coalesced_wait"):
+                    output_text = "".join(stream)
+                enhanced_output = self.clean_response(output_text, timer)
+            except SharedCallCancelled:
+                # Nothing was returned yet, so start over (likely as the leader)
+                return self._answer(user_input, session_id, include_summary, traced)
+            except Exception as e:
+                self._record_chat(timer, session_id, include_summary, cached=False, error=e, coalesced=True)
+                raise
+            self._record_chat(timer, session_id, include_summary, cached=False, coalesced=True)
+            return enhanced_output
+        
+        try:
+            output_text = "".join(stream)
+            enhanced_output = self.clean_response(output_text, timer)
+        except Exception as e:
+            self._record_chat(timer, session_id, include_summary, cached=False, error=e, trace=trace)
+            raise
+        if trace is not None:
+            trace.response = enhanced_output
+        if shared:
+            self._store_cached(user_input, include_summary, enhanced_output)
+        self._record_chat(timer, session_id, include_summary, cached=False, trace=trace)
+        
+        return enhanced_output
+
+    def chat(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False,
+             trace: Optional[bool] = None) -> str:
         """Send a message to BookBuddy and get response."""
         try:
-            # Modify the input to request summary if needed
-            if include_summary:
-                modified_input = f"{user_input}. IMPORTANT: For each book, after the description, add a section that starts with '📖 What it's about:' followed by 2-3 sentences explaining the book's main content, plot, or key themes."
-            else:
-                modified_input = user_input
-                
-            print(f"🔍 Sending to agent: {modified_input[:100]}..." if len(modified_input) > 100 else f"🔍 Sending to agent: {modified_input}")
-                
-            response = self.runtime.invoke_agent(
-                agentId=self.agent_id,
-                agentAliasId=self.alias_id,
-                sessionId=session_id,
-                inputText=modified_input
-            )
-            
-            # Collect and clean response
-            output_text = ""
-            for event in response.get("completion", []):
-                if "chunk" in event:
-                    output_text += event["chunk"]["bytes"].decode("utf-8")
+            return self._answer(user_input, session_id, include_summary, trace)
             
-            # Clean up the response - remove unwanted prefixes and duplicates
-            cleaned_output = output_text.strip()
-            
-            # Remove prefixes from the beginning
-            prefixes_to_remove = ["Bot:", "Assistant:", "AI:", "BookBuddy:", "Human:", "User:"]
-            for prefix in prefixes_to_remove:
-                if cleaned_output.startswith(prefix):
-                    cleaned_output = cleaned_output[len(prefix):].strip()
-                    break
-            
-            # Remove "Bot:" that appears in the middle of responses
-            import re
-            cleaned_output = re.sub(r'\n\s*Bot:\s*', '\n', cleaned_output)
-            cleaned_output = re.sub(r'\s+Bot:\s*', ' ', cleaned_output)
-            
-            # Clean up extra whitespace
-            cleaned_output = re.sub(r'\n\s*\n', '\n\n', cleaned_output)
-            cleaned_output = cleaned_output.strip()
+        except Exception as e:
+            return f"❌ Error: {e}"
+
+    def recommend(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False,
+                  trace: Optional[bool] = None) -> Recommendations:
+        """Like chat(), but return the answer as Book records. Raises on errors."""
+        return parse_recommendations(self._answer(user_input, session_id, include_summary, trace))
+
+    def recommend_stream(self, user_input: str, session_id: str = "demo-session", include_summary: bool = False,
+                         parser: Optional[RecommendationParser] = None,
+                         on_chunk: Optional[Callable[[RecommendationParser], None]] = None,
+                         trace: Optional[bool] = None) -> Iterator[Book]:
+        """Yield each Book as soon as its block has streamed in. Raises on errors.
+        
+        The raw text is cleaned and given purchase links line by line, like
+        chat() answers. Pass a parser to read the intro, outro and pending
+        text as the answer streams; on_chunk is called with it after every
+        chunk, e.g. to show a live preview.
+        """
+        if parser is None:
+            parser = RecommendationParser(normalize=True)
+        for text in self.chat_stream(user_input, session_id, include_summary, trace):
+            yield from parser.feed(text)
+            if on_chunk is not None:
+                on_chunk(parser)
+        yield from parser.close()
+
+    def _run_batch_item(self, index: int, query: str, include_summary: bool,
+                        session_prefix: str) -> BatchResult:
+        """Answer one batch query; throttled sends are already retried by _governed()."""
+        result = BatchResult(index=index, query=query, include_summary=include_summary)
+        session_id = f"{session_prefix}-{uuid.uuid4().hex}"
+        start = time.perf_counter()
+        
+        try:
+            result.response = self._answer(query, session_id, include_summary)
+        except Exception as e:
+            result.error = e
+        
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def chat_many(self,
+                  queries: Iterable[Union[str, Tuple[str, bool]]],
+                  include_summary: bool = False,
+                  max_workers: int = 8,
+                  max_in_flight: Optional[int] = None,
+                  session_prefix: str = "batch") -> Iterator[BatchResult]:
+        """Answer many queries on a thread pool, yielding results in completion order.
+        
+        Each query is either a string or a (query, include_summary) tuple.
+        Errors are captured on the result instead of being returned as text.
+        Throttling is retried per request (see throttle_retries), not per query.
+        """
+        max_in_flight = max_in_flight or max_workers
+        items = iter(enumerate(queries))
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bookbuddy-batch") as pool:
+            pending = set()
             
-            # Enhance with Amazon links if needed
-            enhanced_output = self.enhance_response_with_links(cleaned_output)
+            def submit_next() -> bool:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    return False
+                query, summary = (item, include_summary) if isinstance(item, str) else item
+                pending.add(pool.submit(self._run_batch_item, index, query, summary, session_prefix))
+                return True
             
-            return enhanced_output
+            while len(pending) < max_in_flight and submit_next():
+                pass
             
-        except Exception as e:
-            return f"❌ Error: {e}"
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    submit_next()
+                    yield future.result()
 
     def start_interactive_chat(self) -> None:
         """Start an interactive chat session with BookBuddy."""
         print("\n💡 Ask BookBuddy for book recommendations! Type 'exit' to quit.\n")
         
-        session_id = f"session-{int(time.time())}"
+        # The same session for the whole conversation, renewed if left idle
+        owner = f"cli-{os.getpid()}"
         
         while True:
             try:
@@ -479,8 +1249,23 @@ You are BookBuddy, not Amazon Titan. Just recommend books with purchase links.""
                 if include_summary:
                     user_input = user_input.replace(" with summary", "").replace(" summary", "")
                 
-                response = self.chat(user_input, session_id, include_summary=include_summary)
-                print(f"BookBuddy: {response}\n")
+                # Print the answer as it streams in
+                print("BookBuddy: ", end="", flush=True)
+                streamed = ""
+                session_id = self.sessions.acquire(owner)
+                try:
+                    for text in self.chat_stream(user_input, session_id, include_summary=include_summary):
+                        streamed += text
+                        print(text, end="", flush=True)
+                except Exception as e:
+                    print(f"\n❌ Error: {e}\n")
+                    continue
+                print("\n")
+                
+                # Show the link-enhanced version if post-processing had to add purchase links
+                response = self.clean_response(streamed)
+                if "amazon.com" in response.lower() and "amazon.com" not in streamed.lower():
+                    print(f"🛒 With purchase links:\n{response}\n")
                 
             except KeyboardInterrupt:
                 print("\n👋 Goodbye! Happy reading!")
@@ -500,18 +1285,52 @@ def main():
     if verbose:
         print("🔍 Verbose mode enabled")
     
+    # Ignore saved agent state and run the full setup
+    force = "--force" in sys.argv
+    
+    # --record PATH saves every agent stream to a cassette; --replay PATH
+    # answers from one with no AWS calls (--speed 1 keeps the real pacing)
+    record_path = sys.argv[sys.argv.index("--record") + 1] if "--record" in sys.argv else None
+    replay_path = sys.argv[sys.argv.index("--replay") + 1] if "--replay" in sys.argv else None
+    speed = float(sys.argv[sys.argv.index("--speed") + 1]) if "--speed" in sys.argv else 0.0
+    
+    # --backend direct (or BOOKBUDDY_BACKEND=direct) skips agent orchestration
+    backend = sys.argv[sys.argv.index("--backend") + 1] if "--backend" in sys.argv else os.environ.get("BOOKBUDDY_BACKEND", "agent")
+    # --output-format json (or BOOKBUDDY_OUTPUT_FORMAT=json) has the model
+    # return bare book records and builds the links and formatting here
+    output_format = (sys.argv[sys.argv.index("--output-format") + 1] if "--output-format" in sys.argv
+                     else os.environ.get("BOOKBUDDY_OUTPUT_FORMAT", "markdown"))
+    
+    # Cassettes hold invoke_agent streams; the direct backend calls the model instead
+    if backend == "direct" and (record_path or replay_path):
+        print("❌ --record and --replay only work with the agent backend, not --backend direct")
+        sys.exit(2)
+    
     # Configuration
     config = {
         "agent_name": "BookBuddy",  # Clean name
         "foundation_model": "anthropic.claude-3-haiku-20240307-v1:0",  # Fast, cost-effective
         "alias_name": "BookBuddy",
-        "region": "us-east-1"
+        "region": "us-east-1",
+        "backend": backend,
+        "output_format": output_format
     }
     
-    # Initialize BookBuddy
-    bookbuddy = BookBuddyAgent(**config)
+    runtime = None
+    if replay_path:
+        runtime = ReplayRuntime(CassetteStore(replay_path), speed=speed)
+    elif record_path:
+        runtime = RecordingRuntime(get_client("bedrock-agent-runtime", config["region"]), CassetteStore(record_path))
+    
+    # Initialize BookBuddy with an in-memory response cache
+    bookbuddy = BookBuddyAgent(**config, cache=ResponseCache(), query_index=SimilarQueryIndex(), runtime=runtime)
     
-    if bookbuddy.initialize():
+    if replay_path:
+        # Recordings are matched by input text, so any agent ID will do
+        print(f"📼 Replaying {len(runtime.store)} recorded answers from {replay_path}")
+        bookbuddy.agent_id = bookbuddy.alias_id = "replay"
+        bookbuddy.start_interactive_chat()
+    elif bookbuddy.initialize(force=force):
         bookbuddy.start_interactive_chat()
     else:
         print("❌ Failed to initialize BookBuddy. Please check the error messages above.")
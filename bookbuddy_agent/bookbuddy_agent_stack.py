@@ -57,7 +57,7 @@ Recommend books based on user preferences, genre, or mood.
 Provide title, author, genre, and a short reason.
 Only suggest well-known or highly-rated books.""",
             description="AI reading companion that recommends books",
-            idle_session_ttl_in_seconds=1800,  # 30 minutes
+            idle_session_ttl_in_seconds=1800,  # 30 minutes; keep in sync with session_pool.DEFAULT_IDLE_TTL
             auto_prepare=True
         )
         
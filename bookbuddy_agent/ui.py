@@ -9,10 +9,16 @@ import streamlit as st
 import sys
 import os
 import time
+import uuid
 
 # Add parent directory to path to import bookbuddy module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from bookbuddy import BookBuddyAgent
+from metrics import PhaseMetrics
+from query_index import SimilarQueryIndex
+from recommendations import RecommendationParser
+from response_cache import ResponseCache
+from ui_panels import render_ops_panel
 
 # Configure Streamlit page
 st.set_page_config(
@@ -104,10 +110,18 @@ def initialize_bookbuddy():
         "agent_name": "BookBuddy",
         "foundation_model": "anthropic.claude-3-haiku-20240307-v1:0",
         "alias_name": "BookBuddy",
-        "region": "us-east-1"
+        "region": "us-east-1",
+        # "direct" skips Bedrock Agents orchestration and calls the model itself
+        "backend": os.environ.get("BOOKBUDDY_BACKEND", "agent"),
+        # "json" has the model return bare book records; links and formatting are added here
+        "output_format": os.environ.get("BOOKBUDDY_OUTPUT_FORMAT", "markdown")
     }
     
-    bookbuddy = BookBuddyAgent(**config)
+    # Cache answers on disk so they survive a Streamlit restart
+    cache = ResponseCache(db_path=".bookbuddy_cache.sqlite3")
+    # Phase timings are also appended to a JSON-lines log for offline analysis
+    metrics = PhaseMetrics(log_path=".bookbuddy_metrics.jsonl")
+    bookbuddy = BookBuddyAgent(**config, cache=cache, query_index=SimilarQueryIndex(), metrics=metrics)
     
     with st.spinner("🚀 Initializing BookBuddy..."):
         if bookbuddy.initialize():
@@ -144,6 +158,28 @@ if bookbuddy is None:
     st.error("❌ BookBuddy is not available. Please check your configuration.")
     st.stop()
 
+# Each browser session keeps one agent session
+if "session_owner" not in st.session_state:
+    st.session_state.session_owner = uuid.uuid4().hex
+with st.sidebar:
+    if st.button("🆕 New conversation"):
+        bookbuddy.sessions.release(st.session_state.session_owner)
+    st.caption(f"👥 Live sessions: {bookbuddy.sessions.stats()['live_sessions']}")
+
+with st.sidebar:
+    # Per browser session: the agent is shared, so its own setting is left alone
+    trace_steps = st.checkbox("🔎 Trace agent steps", value=False, key="trace_steps",
+                              help="Ask the agent for orchestration traces to see where its time goes")
+    # Cache statistics
+    if bookbuddy.cache is not None:
+        with st.expander("⚡ Cache Stats"):
+            st.json(bookbuddy.cache.stats())
+        if bookbuddy.query_index is not None:
+            st.write("**Near-duplicate matches:**")
+            st.json(bookbuddy.query_index.stats())
+            for match in list(bookbuddy.query_index.recent_matches)[-5:]:
+                st.caption(f"'{match.query}' → '{match.matched_query}': {match.reason}")
+
 # Input section
 col1, col2 = st.columns([3, 1])
 
@@ -167,112 +203,37 @@ get_rec = st.button("🔍 Get Recommendations", type="primary")
 if get_rec and query:
     with st.spinner("🤔 BookBuddy is finding the perfect books for you..."):
         try:
-            # Generate a unique session ID automatically
-            session_id = f"session-{int(time.time())}"
-            response = bookbuddy.chat(query, session_id, include_summary=include_summary)
+            # Reuse this browser session's agent session so follow-ups keep context
+            session_id = bookbuddy.sessions.acquire(st.session_state.session_owner)
+            
+            st.markdown("### 📚 Recommendations:")
+            
+            # Show each book card as soon as its purchase line arrives, with
+            # the unfinished block streaming live below the finished ones
+            intro_output = st.empty()
+            books_area = st.container()
+            live_output = st.empty()
+            parser = RecommendationParser(normalize=True)
+            
+            def show_pending(parser):
+                live_output.markdown(parser.pending_text + "▌")
+            
+            for book in bookbuddy.recommend_stream(query, session_id, include_summary=include_summary,
+                                                   parser=parser, on_chunk=show_pending, trace=trace_steps):
+                if len(parser.books) == 1:
+                    intro_output.markdown(parser.intro)
+                books_area.markdown(book.to_html(), unsafe_allow_html=True)
+            live_output.empty()
+            
+            # Reruns render the stored records
+            response = parser.result()
+            intro_output.markdown(response.intro)
+            if response.outro:
+                st.markdown(response.outro)
             
-            if response and not response.startswith("❌"):
+            if response.books or response.intro:
                 st.success("📚 Here are BookBuddy's recommendations:")
                 
-                # Display the response with enhanced formatting
-                st.markdown("### 📚 Recommendations:")
-                
-                # Simple approach: treat entire response as one formatted block
-                def convert_markdown_to_html(text):
-                    """Convert markdown formatting to HTML."""
-                    import re
-                    # Convert **bold** to <strong>bold</strong>
-                    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
-                    return text
-                
-                def clean_amazon_urls(text):
-                    """Clean up malformed Amazon URLs."""
-                    import re
-                    
-                    # Find malformed URLs that contain too much text
-                    def fix_url(match):
-                        full_url = match.group(0)
-                        # If URL is too long (more than 80 chars), it's probably malformed
-                        if len(full_url) > 80:
-                            # Try to extract book title and author from the surrounding text
-                            # Look for pattern like "📚 **Title** by Author" before the URL
-                            context = text[:match.start()]
-                            
-                            # Try multiple patterns to find book info
-                            patterns = [
-                                r'📚\s*\*\*(.*?)\*\*\s*by\s*(.*?)(?:\n|$)',  # Standard format
-                                r'book\s+"([^"]+)"\s*by\s*([^\n]+)',         # "Book Title" by Author
-                                r'The\s+Power\s+of\s+Habit.*?Charles\s+Duhigg',  # Specific fallback
-                            ]
-                            
-                            for pattern in patterns:
-                                book_match = re.search(pattern, context[-300:], re.IGNORECASE)
-                                if book_match:
-                                    if len(book_match.groups()) >= 2:
-                                        title = book_match.group(1).strip()
-                                        author = book_match.group(2).strip()
-                                    else:
-                                        # For specific patterns, use hardcoded values
-                                        title = "The Power of Habit"
-                                        author = "Charles Duhigg"
-                                    
-                                    # Clean title and author
-                                    title = re.sub(r'[^\w\s]', '', title).replace(' ', '+')
-                                    author = re.sub(r'[^\w\s]', '', author).replace(' ', '+')
-                                    return f"https://amazon.com/s?k={title}+{author}"
-                            
-                            # If no pattern matches, try to extract from the URL itself
-                            # Look for recognizable book titles in the URL
-                            if "Power+of+Habit" in full_url or "Power+Habit" in full_url:
-                                return "https://amazon.com/s?k=The+Power+of+Habit+Charles+Duhigg"
-                        
-                        return full_url
-                    
-                    # Fix malformed Amazon URLs
-                    text = re.sub(r'https://amazon\.com/s\?k=[^\s\n]+', fix_url, text)
-                    return text
-                
-                def format_summary_sections(text):
-                    """Format summary sections with better styling."""
-                    import re
-                    
-                    # Find and format summary sections
-                    def format_summary(match):
-                        summary_text = match.group(0)
-                        # Add proper styling to summary sections
-                        formatted = f'<div class="summary-section">{summary_text}</div>'
-                        return formatted
-                    
-                    # Format lines that start with 📖
-                    text = re.sub(r'📖[^\n]*(?:\n(?!📚|🛒)[^\n]*)*', format_summary, text, flags=re.MULTILINE)
-                    return text
-                
-                def make_links_clickable(text):
-                    """Convert Amazon URLs to clickable links."""
-                    import re
-                    
-                    def create_link(match):
-                        url = match.group(0)
-                        return f'<a href="{url}" target="_blank" style="color: #007bff; text-decoration: underline;">{url}</a>'
-                    
-                    # Make Amazon URLs clickable
-                    text = re.sub(r'https://amazon\.com/s\?k=[^\s\n]+', create_link, text)
-                    return text
-                
-                # Clean up malformed Amazon URLs first, then format
-                cleaned_response = clean_amazon_urls(response)
-                summary_formatted = format_summary_sections(cleaned_response)
-                clickable_links = make_links_clickable(summary_formatted)
-                formatted_response = convert_markdown_to_html(clickable_links)
-                
-                # Create one container for the entire response
-                with st.container():
-                    st.markdown(f"""
-                    <div class="book-item">
-                        <div style="line-height: 1.6; white-space: pre-line;">{formatted_response}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
                 # Add helpful tip
                 st.info("💡 **Tip:** Click the 🛒 Buy links to purchase books directly from Amazon!")
                 
@@ -288,10 +249,10 @@ if get_rec and query:
                 })
                 
             else:
-                st.error(f"❌ Error getting recommendations: {response}")
+                st.error("❌ Error getting recommendations: empty response")
                 # Show more details for debugging
                 with st.expander("🔍 Debug Details"):
-                    st.code(f"Response: {response}")
+                    st.code(f"Response: {response.to_dict()}")
                 
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
@@ -313,7 +274,10 @@ if "recommendations" in st.session_state and st.session_state.recommendations:
         with st.expander(f"💬 {rec['query'][:50]}..." if len(rec['query']) > 50 else f"💬 {rec['query']}"):
             st.markdown(f"**You asked:** {rec['query']}")
             st.markdown(f"**BookBuddy recommended:**")
-            st.markdown(rec["response"])
+            st.markdown(rec["response"].to_html(), unsafe_allow_html=True)
+
+# Rendered last so it includes this run's request
+render_ops_panel(bookbuddy)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Cassettes
+Record invoke_agent streams to disk and replay them without network access
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, List
+
+from botocore.exceptions import ClientError
+
+
+class CassetteMiss(KeyError):
+    """A replayed request has no recording in the cassette."""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Identify a request by what it asks, not by which agent or session it went to.
+
+    Agent, alias and session IDs differ between environments and runs, so
+    a recording made against one deployment replays against any other.
+    """
+    raw = f"{request.get('inputText', '')}\x1f{int(bool(request.get('enableTrace')))}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """Recorded invoke_agent calls in a gzipped JSON-lines file.
+
+    Each line holds one call: the request, the delay before invoke_agent
+    returned, and every stream event with the delay since the previous one.
+    Chunk bytes are kept exactly as received, so chunk boundaries (and
+    characters split across them) replay unchanged.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._recordings: Dict[str, List[Dict[str, Any]]] = {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    recording = json.loads(line)
+                    self._recordings.setdefault(recording["key"], []).append(recording)
+
+    def __len__(self) -> int:
+        return sum(len(recordings) for recordings in self._recordings.values())
+
+    def add(self, recording: Dict[str, Any]) -> None:
+        """Keep a recording and append it to the cassette file."""
+        line = json.dumps(recording, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            self._recordings.setdefault(recording["key"], []).append(recording)
+            # Appending starts a new gzip member; readers see one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def find(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the next recording for a request, cycling through repeats."""
+        key = request_key(request)
+        with self._lock:
+            recordings = self._recordings.get(key)
+            if not recordings:
+                raise CassetteMiss(f"No recording for input {request.get('inputText', '')[:60]!r}")
+            index = self._next.get(key, 0)
+            self._next[key] = (index + 1) % len(recordings)
+            return recordings[index]
+
+
+def _encode_event(event: Dict[str, Any]) -> List[Any]:
+    if "chunk" in event:
+        return ["chunk", base64.b64encode(event["chunk"].get("bytes", b"")).decode("ascii")]
+    if "trace" in event:
+        return ["trace", event["trace"]]
+    # Anything else is kept as-is for completeness
+    name = next(iter(event), "unknown")
+    return [name, event.get(name)]
+
+
+def _decode_event(kind: str, payload: Any) -> Dict[str, Any]:
+    if kind == "chunk":
+        return {"chunk": {"bytes": base64.b64decode(payload)}}
+    return {kind: payload}
+
+
+class RecordingRuntime:
+    """Wraps a bedrock-agent-runtime client and records each invoke_agent call."""
+
+    def __init__(self, runtime: Any, store: CassetteStore):
+        self.runtime = runtime
+        self.store = store
+
+    def invoke_agent(self, **request: Any) -> Dict[str, Any]:
+        recording: Dict[str, Any] = {
+            "key": request_key(request),
+            "request": {name: value for name, value in request.items() if name != "sessionState"},
+            "recorded_at": time.time(),
+            "events": [],
+        }
+        start = time.perf_counter()
+        try:
+            response = self.runtime.invoke_agent(**request)
+        except ClientError as e:
+            recording["send_delay"] = time.perf_counter() - start
+            recording["error"] = e.response
+            recording["error_during"] = "send"
+            self.store.add(recording)
+            raise
+        returned = time.perf_counter()
+        recording["send_delay"] = returned - start
+
+        result = dict(response)
+        result["completion"] = self._record_stream(response.get("completion", []), recording, returned)
+        return result
+
+    def _record_stream(self, completion: Any, recording: Dict[str, Any], last: float) -> Iterator[Dict[str, Any]]:
+        try:
+            for event in completion:
+                now = time.perf_counter()
+                recording["events"].append([round(now - last, 6)] + _encode_event(event))
+                yield event
+                # Restart the clock once the consumer is done, so delays
+                # hold only the agent's own gaps between events
+                last = time.perf_counter()
+        except ClientError as e:
+            recording["error"] = e.response
+            recording["error_during"] = "stream"
+            self.store.add(recording)
+            raise
+        # Streams abandoned part-way are not saved
+        self.store.add(recording)
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything other than invoke_agent goes straight to the real client
+        return getattr(self.runtime, name)
+
+
+class ReplayRuntime:
+    """Serves recorded invoke_agent calls in place of a runtime client.
+
+    speed scales the recorded delays: 1.0 replays at the pace the agent
+    answered, 2.0 twice as fast, and 0 (the default) with no waiting.
+    """
+
+    def __init__(self, store: CassetteStore, speed: float = 0.0):
+        self.store = store
+        self.speed = speed
+
+    def _wait(self, seconds: float) -> None:
+        if self.speed > 0 and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def invoke_agent(self, **request: Any) -> Dict[str, Any]:
+        recording = self.store.find(request)
+        self._wait(recording.get("send_delay", 0.0))
+        if recording.get("error_during") == "send":
+            raise ClientError(recording["error"], "InvokeAgent")
+        return {
+            "sessionId": request.get("sessionId"),
+            "completion": self._replay_stream(recording),
+        }
+
+    def _replay_stream(self, recording: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for delay, kind, payload in recording["events"]:
+            self._wait(delay)
+            yield _decode_event(kind, payload)
+        if "error" in recording:
+            raise ClientError(recording["error"], "InvokeAgent")
@@ -1,9 +1,10 @@
-import boto3
 import json
 
+from aws_clients import get_client
+
 # Check what models are available and accessible
-bedrock = boto3.client("bedrock", region_name="us-east-1")
-bedrock_runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
+bedrock = get_client("bedrock", "us-east-1")
+bedrock_runtime = get_client("bedrock-runtime", "us-east-1")
 
 print("🔍 Checking available foundation models...")
 
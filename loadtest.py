@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Load Test
+Simulates concurrent users against one shared BookBuddyAgent and reports
+throughput, tail latency, time-to-first-chunk and error rates
+
+Usage:
+    python3 loadtest.py --users 20 --duration 60
+    python3 loadtest.py --users 50 --ttfc-ms 800 --chunk-ms 40 --error-rate 0.01
+    python3 loadtest.py --replay answers.jsonl.gz --speed 1 --users 10
+    python3 loadtest.py --target agent --users 5 --duration 120
+    python3 loadtest.py --users 30 --rps 2 --tpm 40000 --throttle-rate 0.05
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+from botocore.exceptions import ClientError
+
+from benchmarks.corpus import make_response
+from bookbuddy import BookBuddyAgent, is_throttling_error
+from cassette import CassetteStore, ReplayRuntime
+from metrics import QUANTILES, quantile
+from rate_governor import RateGovernor, RateLimits
+from response_cache import ResponseCache
+
+DEFAULT_QUERIES = [
+    "motivational books",
+    "sci-fi novels",
+    "self-help books",
+    "books about habits",
+    "mystery novels",
+    "business books",
+    "psychology books",
+    "books for entrepreneurs",
+]
+
+
+def _lognormal(rng: random.Random, median: float, sigma: float) -> float:
+    """Sample a right-skewed latency with the given median."""
+    if median <= 0:
+        return 0.0
+    return median * math.exp(rng.gauss(0.0, sigma)) if sigma > 0 else median
+
+
+class SimulatedRuntime:
+    """Local stand-in for the bedrock-agent-runtime client.
+
+    Latencies are log-normal around the given medians (in seconds); sigma
+    sets how heavy the tail is. A share of requests fails with a throttling
+    or internal error, as the real service does under load.
+    """
+
+    def __init__(self,
+                 send_latency: float = 0.05,
+                 first_chunk_latency: float = 1.0,
+                 chunk_interval: float = 0.03,
+                 sigma: float = 0.5,
+                 chunk_size: int = 64,
+                 throttle_rate: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+
+        self.send_latency = send_latency
+        self.first_chunk_latency = first_chunk_latency
+        self.chunk_interval = chunk_interval
+        self.sigma = sigma
+        self.chunk_size = chunk_size
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> Tuple[float, int]:
+        # Draw under a lock so seeded runs do not depend on thread interleaving
+        with self._lock:
+            return self._rng.random(), self._rng.randrange(1 << 30)
+
+    def invoke_agent(self, **request: Any) -> Dict[str, Any]:
+        failure, seed = self._draw()
+        rng = random.Random(seed)
+        time.sleep(_lognormal(rng, self.send_latency, self.sigma))
+
+        if failure < self.throttle_rate:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeAgent")
+        if failure < self.throttle_rate + self.error_rate:
+            raise ClientError({"Error": {"Code": "InternalServerException", "Message": "Simulated failure"}}, "InvokeAgent")
+
+        with_summary = "What it's about" in request.get("inputText", "")
+        text = make_response(rng.randint(2, 3), with_summary=with_summary, seed=seed).encode("utf-8")
+        return {"sessionId": request.get("sessionId"), "completion": self._stream(text, rng)}
+
+    def _stream(self, text: bytes, rng: random.Random) -> Iterator[Dict[str, Any]]:
+        time.sleep(_lognormal(rng, self.first_chunk_latency, self.sigma))
+        for i in range(0, len(text), self.chunk_size):
+            if i:
+                time.sleep(_lognormal(rng, self.chunk_interval, self.sigma))
+            yield {"chunk": {"bytes": text[i:i + self.chunk_size]}}
+
+
+@dataclass
+class RequestSample:
+    """Outcome of one simulated user request."""
+    user: int
+    query: str
+    include_summary: bool
+    started: float
+    latency: float
+    first_chunk: Optional[float] = None
+    error: Optional[str] = None
+
+
+def _error_name(error: Exception) -> str:
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "ClientError")
+        return f"{code} (throttled)" if is_throttling_error(error) else code
+    return type(error).__name__
+
+
+class LoadTest:
+    """Runs simulated users against one shared agent, like the Streamlit app does."""
+
+    def __init__(self, bookbuddy: BookBuddyAgent, users: int, duration: float,
+                 think_time: float, queries: List[str], summary_ratio: float,
+                 ramp_up: float = 0.0, seed: Optional[int] = None):
+        self.bookbuddy = bookbuddy
+        self.users = users
+        self.duration = duration
+        self.think_time = think_time
+        self.queries = queries
+        self.summary_ratio = summary_ratio
+        self.ramp_up = ramp_up
+        self.seed = seed
+
+        self.samples: List[RequestSample] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.elapsed = 0.0
+
+    def _user(self, user: int, started: float) -> None:
+        rng = random.Random(None if self.seed is None else self.seed + user)
+        session_id = f"loadtest-{uuid.uuid4().hex}"
+        # Stagger arrivals over the ramp-up period
+        if self._stop.wait(self.ramp_up * user / max(1, self.users)):
+            return
+
+        while not self._stop.is_set():
+            query = rng.choice(self.queries)
+            include_summary = rng.random() < self.summary_ratio
+            request_start = time.perf_counter()
+            sample = RequestSample(user=user, query=query, include_summary=include_summary,
+                                   started=request_start - started, latency=0.0)
+            try:
+                for _ in self.bookbuddy.chat_stream(query, session_id, include_summary):
+                    if sample.first_chunk is None:
+                        sample.first_chunk = time.perf_counter() - request_start
+            except Exception as e:
+                sample.error = _error_name(e)
+            sample.latency = time.perf_counter() - request_start
+
+            with self._lock:
+                self.samples.append(sample)
+
+            # Exponential think time between requests, like independent users
+            if self.think_time > 0:
+                self._stop.wait(rng.expovariate(1.0 / self.think_time))
+
+    def run(self) -> None:
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._user, args=(user, started),
+                                    name=f"loadtest-user-{user}", daemon=True)
+                   for user in range(self.users)]
+        for thread in threads:
+            thread.start()
+        try:
+            self._stop.wait(self.duration)
+        except KeyboardInterrupt:
+            # stdout may be silenced for the run
+            print("\n⏹️ Stopping early...", file=sys.stderr)
+        self._stop.set()
+        # Let in-flight requests finish so their latencies are counted
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+
+    def report(self) -> Dict[str, Any]:
+        """Throughput, latency and error figures for the whole run."""
+        samples = list(self.samples)
+        ok = [sample for sample in samples if sample.error is None]
+        latencies = [sample.latency for sample in ok]
+        first_chunks = [sample.first_chunk for sample in ok if sample.first_chunk is not None]
+
+        errors: Dict[str, int] = {}
+        for sample in samples:
+            if sample.error is not None:
+                errors[sample.error] = errors.get(sample.error, 0) + 1
+
+        def quantiles(values: List[float]) -> Dict[str, Optional[float]]:
+            return {f"p{int(q * 100)}": quantile(values, q) for q in QUANTILES}
+
+        return {
+            "users": self.users,
+            "elapsed": self.elapsed,
+            "requests": len(samples),
+            "succeeded": len(ok),
+            "throughput_rps": len(ok) / self.elapsed if self.elapsed else 0.0,
+            "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+            "errors": errors,
+            "latency": quantiles(latencies),
+            "first_chunk": quantiles(first_chunks),
+            "summary_requests": sum(1 for sample in samples if sample.include_summary),
+            "rate_governor": self.bookbuddy.governor.stats(),
+            # None when identical in-flight requests were not coalesced
+            "single_flight": (self.bookbuddy.single_flight.stats()
+                              if self.bookbuddy.single_flight is not None else None),
+        }
+
+
+def _format_quantiles(values: Dict[str, Optional[float]]) -> str:
+    return "  ".join(f"{name} {'-' if value is None else f'{value * 1000:,.0f}ms'}"
+                     for name, value in values.items())
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['users']} users over {report['elapsed']:.1f}s")
+    print(f"   Requests:     {report['requests']} ({report['succeeded']} ok, "
+          f"{report['summary_requests']} with summary)")
+    print(f"   Throughput:   {report['throughput_rps']:.2f} req/s")
+    print(f"   Latency:      {_format_quantiles(report['latency'])}")
+    print(f"   First chunk:  {_format_quantiles(report['first_chunk'])}")
+    print(f"   Error rate:   {report['error_rate']:.1%}")
+    for name, count in sorted(report["errors"].items(), key=lambda item: -item[1]):
+        print(f"      {name}: {count}")
+    for model_id, stats in report["rate_governor"].items():
+        print(f"   Governor:     {model_id}: {stats['queued']}/{stats['granted']} queued, "
+              f"wait mean {stats['wait_mean_ms']:,.0f}ms max {stats['wait_max_ms']:,.0f}ms, "
+              f"{stats['throttles']} throttled")
+    single_flight = report["single_flight"]
+    if single_flight is None:
+        print("   Coalescing:   off")
+    else:
+        print(f"   Coalescing:   on, {single_flight['calls_saved']} of "
+              f"{single_flight['agent_calls'] + single_flight['calls_saved']} calls shared "
+              f"({single_flight['saved_ratio']:.0%})")
+
+
+def build_agent(args: argparse.Namespace) -> Optional[BookBuddyAgent]:
+    """Create the shared agent for the chosen target."""
+    config = {
+        "agent_name": "BookBuddy",
+        "foundation_model": "anthropic.claude-3-haiku-20240307-v1:0",
+        "alias_name": "BookBuddy",
+        "region": "us-east-1"
+    }
+    cache = ResponseCache() if args.cache else None
+    # Without --rps/--tpm the process-wide governor (BOOKBUDDY_RATE_LIMITS) is used
+    governor = None
+    if args.rps or args.tpm:
+        limits = RateLimits(args.rps or float("inf"), args.tpm or float("inf"))
+        governor = RateGovernor({config["foundation_model"]: limits})
+
+    if args.target == "agent":
+        bookbuddy = BookBuddyAgent(**config, cache=cache, governor=governor, coalesce=not args.no_coalesce)
+        return bookbuddy if bookbuddy.initialize() else None
+
+    if args.replay:
+        runtime = ReplayRuntime(CassetteStore(args.replay), speed=args.speed)
+    else:
+        runtime = SimulatedRuntime(
+            send_latency=args.send_ms / 1000,
+            first_chunk_latency=args.ttfc_ms / 1000,
+            chunk_interval=args.chunk_ms / 1000,
+            sigma=args.sigma,
+            throttle_rate=args.throttle_rate,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        )
+    # The stand-in ignores agent IDs, so no provisioning is needed
+    bookbuddy = BookBuddyAgent(**config, cache=cache, state_path=None, runtime=runtime, governor=governor,
+                               coalesce=not args.no_coalesce)
+    bookbuddy.agent_id = bookbuddy.alias_id = args.target
+    return bookbuddy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="bookbuddy-loadtest",
+                                     description="Drive concurrent BookBuddy sessions and report tail latency")
+    parser.add_argument("--target", choices=["simulated", "agent"], default="simulated",
+                        help="Run against a local stand-in (default) or the real Bedrock agent")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users (default: 10)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test length in seconds (default: 30)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which users start (default: 0)")
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="Mean seconds a user waits between requests (default: 2)")
+    parser.add_argument("--queries", help="File with one query per line (default: built-in mix)")
+    parser.add_argument("--summary-ratio", type=float, default=0.2,
+                        help="Share of requests asking for summaries (default: 0.2)")
+    parser.add_argument("--cache", action="store_true", help="Enable the in-memory response cache")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="Send every request to the model, even identical ones already in flight")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible query mixes and latencies")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's per-request output")
+    parser.add_argument("--rps", type=float, help="Pace model requests to this many per second")
+    parser.add_argument("--tpm", type=float, help="Pace model tokens to this many per minute")
+
+    simulated = parser.add_argument_group("simulated target")
+    simulated.add_argument("--send-ms", type=float, default=50.0, help="Median request send latency (default: 50)")
+    simulated.add_argument("--ttfc-ms", type=float, default=1000.0, help="Median time to first chunk (default: 1000)")
+    simulated.add_argument("--chunk-ms", type=float, default=30.0, help="Median gap between chunks (default: 30)")
+    simulated.add_argument("--sigma", type=float, default=0.5,
+                           help="Log-normal spread of every latency; larger means heavier tails (default: 0.5)")
+    simulated.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests throttled")
+    simulated.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing otherwise")
+    simulated.add_argument("--replay", help="Serve recorded answers from this cassette instead")
+    simulated.add_argument("--speed", type=float, default=1.0,
+                           help="Replay pace; 1 is the recorded pace, 0 is instant (default: 1)")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    bookbuddy = build_agent(args)
+    if bookbuddy is None:
+        print("❌ Failed to initialize BookBuddy")
+        raise SystemExit(1)
+
+    target = "replayed" if args.replay and args.target == "simulated" else args.target
+    print(f"🏋️ {args.users} users for {args.duration:.0f}s against the {target} target...")
+    test = LoadTest(bookbuddy, args.users, args.duration, args.think_time, queries,
+                    args.summary_ratio, ramp_up=args.ramp_up, seed=args.seed)
+    # The agent prints every query it sends; discard that rather than
+    # buffering it for the whole run
+    with open(os.devnull, "w") as devnull:
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+            test.run()
+
+    report = test.report()
+    print_report(report)
+
+    if args.output:
+        report["samples"] = [asdict(sample) for sample in test.samples]
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
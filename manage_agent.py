@@ -5,10 +5,20 @@ Provides utilities to manage the BookBuddy agent
 """
 
 import sys
-from bookbuddy import BookBuddyAgent
+from agent_trace import format_summary, summarize_traces
+from bookbuddy import OUTPUT_FORMATS, BookBuddyAgent
+
+# Used by the trace command when no queries are given
+SAMPLE_QUERIES = [
+    "motivational books",
+    "sci-fi novels",
+    "books about habits",
+    "mystery novels with summary",
+    "books for entrepreneurs",
+]
 
 def delete_agent():
-    """Delete the BookBuddy agent."""
+    """Delete the BookBuddy agents for every output format."""
     config = {
         "agent_name": "BookBuddy",
         "foundation_model": "anthropic.claude-3-haiku-20240307-v1:0",
@@ -16,37 +26,74 @@ def delete_agent():
         "region": "us-east-1"
     }
     
-    bookbuddy = BookBuddyAgent(**config)
-    
-    # Find existing agent
-    agents_response = bookbuddy.bedrock.list_agents()
-    agents = agents_response.get("agentSummaries", [])
-    existing_agent = next((a for a in agents if a['agentName'] == config["agent_name"]), None)
-    
-    if existing_agent:
-        agent_id = existing_agent['agentId']
-        bookbuddy.delete_agent(agent_id)
-        print("✅ Agent deleted successfully")
-    else:
-        print("❌ No agent found to delete")
+    # Each output format has its own agent and saved state
+    for output_format in OUTPUT_FORMATS:
+        bookbuddy = BookBuddyAgent(**config, output_format=output_format)
+        
+        # Find existing agent
+        agent_id = bookbuddy.resolver.find_agent_id(bookbuddy.agent_name)
+        
+        if agent_id:
+            bookbuddy.delete_agent(agent_id)
+            print(f"✅ Agent {bookbuddy.agent_name} deleted successfully")
+        else:
+            print(f"ℹ️ No agent {bookbuddy.agent_name} found to delete")
+        bookbuddy.clear_state()
 
 def list_agents():
     """List all agents."""
     config = {"region": "us-east-1"}
     bookbuddy = BookBuddyAgent(**config)
     
-    agents_response = bookbuddy.bedrock.list_agents()
-    agents = agents_response.get("agentSummaries", [])
+    agents = bookbuddy.resolver.agents()
     
     print(f"Found {len(agents)} agents:")
     for agent in agents:
         print(f"  - {agent['agentName']} (ID: {agent['agentId']})")
 
+def trace_queries(queries):
+    """Run queries with agent traces on and show which agent step dominates latency."""
+    config = {
+        "agent_name": "BookBuddy",
+        "foundation_model": "anthropic.claude-3-haiku-20240307-v1:0",
+        "alias_name": "BookBuddy",
+        "region": "us-east-1"
+    }
+    
+    # No response cache, so every query reaches the agent
+    bookbuddy = BookBuddyAgent(**config, trace=True)
+    if not bookbuddy.initialize():
+        print("❌ Failed to initialize BookBuddy")
+        return
+    
+    for i, query in enumerate(queries):
+        include_summary = query.endswith(" with summary")
+        query = query[:-len(" with summary")] if include_summary else query
+        response = bookbuddy.chat(query, session_id=f"trace-{i}", include_summary=include_summary)
+        if response.startswith("❌"):
+            print(f"{response}\n")
+            continue
+        trace = bookbuddy.traces[-1]
+        print(f"\n🔎 {query} ({trace.total:.1f}s)")
+        for line in trace.timeline():
+            print(f"   {line}")
+        for invocation in trace.model_invocations():
+            print(f"   🧠 {invocation.step} model call: {invocation.duration * 1000:.0f}ms, "
+                  f"{invocation.input_tokens or '?'} → {invocation.output_tokens or '?'} tokens")
+    
+    if bookbuddy.traces:
+        summaries = summarize_traces(bookbuddy.traces)
+        print(f"\n📊 Agent steps across {len(bookbuddy.traces)} queries:")
+        for line in format_summary(summaries):
+            print(f"   {line}")
+        print(f"\n🐢 Slowest step: {summaries[0].step}")
+
 def main():
     if len(sys.argv) < 2:
         print("Usage:")
-        print("  python3 manage_agent.py delete    # Delete BookBuddy agent")
+        print("  python3 manage_agent.py delete    # Delete BookBuddy agents (markdown and json)")
         print("  python3 manage_agent.py list      # List all agents")
+        print("  python3 manage_agent.py trace [query ...]  # Time agent steps over sample queries")
         return
     
     command = sys.argv[1].lower()
@@ -55,6 +102,8 @@ def main():
         delete_agent()
     elif command == "list":
         list_agents()
+    elif command == "trace":
+        trace_queries(sys.argv[2:] or SAMPLE_QUERIES)
     else:
         print(f"Unknown command: {command}")
 
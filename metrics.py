@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Metrics
+Per-phase latency histograms with OpenMetrics export and JSON log lines
+"""
+
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator, List, Sequence, Tuple
+
+# Upper bounds in seconds, from local post-processing (sub-millisecond) up
+# to slow agent answers
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+def quantile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank q-quantile of values, or None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent: "deque[float]" = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the q-quantile of the recent window, or None when empty."""
+        return quantile(self.recent, q)
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Return (upper bound, observations at or below it) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class PhaseMetrics:
+    """Latency histograms keyed by (operation, phase), plus plain counters.
+
+    record() takes the phase durations of one request, adds them to the
+    histograms and writes them as one JSON line to log_path, if given.
+    The most recent records are kept in memory for dashboards.
+    """
+
+    def __init__(self,
+                 log_path: Optional[str] = None,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 window: int = 1024,
+                 recent_records: int = 50):
+
+        self.log_path = log_path
+        self.buckets = tuple(buckets)
+        self.window = window
+
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.recent_records: "deque[Dict[str, Any]]" = deque(maxlen=recent_records)
+
+    def observe(self, operation: str, phase: str, seconds: float) -> None:
+        """Add one duration to the (operation, phase) histogram."""
+        with self._lock:
+            histogram = self._histograms.get((operation, phase))
+            if histogram is None:
+                histogram = self._histograms[(operation, phase)] = Histogram(self.buckets, self.window)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Add to a counter, exported as bookbuddy_<name>_total."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counters(self) -> Dict[str, float]:
+        """Return a copy of every counter."""
+        with self._lock:
+            return dict(self._counters)
+
+    def record(self, operation: str, phases: Dict[str, float], **fields: Any) -> Dict[str, Any]:
+        """Observe every phase of one request and log it; returns the log record."""
+        for phase, seconds in phases.items():
+            self.observe(operation, phase, seconds)
+
+        record = {
+            "ts": round(time.time(), 3),
+            "event": operation,
+            "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in phases.items()},
+        }
+        record.update(fields)
+        self.recent_records.append(record)
+
+        if self.log_path:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+            try:
+                with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not write metrics log: {e}")
+        return record
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Return count and p50/p95/p99 in milliseconds per operation and phase."""
+        summary: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (operation, phase), histogram in self._histograms.items():
+                row: Dict[str, Any] = {"count": histogram.count}
+                for q in QUANTILES:
+                    value = histogram.quantile(q)
+                    row[f"p{int(q * 100)}_ms"] = None if value is None else round(value * 1000, 3)
+                summary.setdefault(operation, {})[phase] = row
+        return summary
+
+    def to_openmetrics(self, name: str = "bookbuddy_phase_duration_seconds") -> str:
+        """Render every histogram in the OpenMetrics text exposition format."""
+        lines = [
+            f"# TYPE {name} histogram",
+            f"# UNIT {name} seconds",
+            f"# HELP {name} Time spent in each phase of a BookBuddy operation.",
+        ]
+        with self._lock:
+            for (operation, phase), histogram in sorted(self._histograms.items()):
+                labels = f'operation="{_escape_label(operation)}",phase="{_escape_label(phase)}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{_format_value(bound)}"}} {count}')
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+                lines.append(f"{name}_sum{{{labels}}} {_format_value(histogram.sum)}")
+            for counter, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE bookbuddy_{counter} counter")
+                lines.append(f"bookbuddy_{counter}_total {_format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop all histograms and recent records."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.recent_records.clear()
+
+
+class PhaseTimer:
+    """Collects the phase durations of a single request.
+
+    fields holds any other values to log with them, such as token counts.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block; repeated phases accumulate."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.started
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Response Post-processing
+Precompiled, staged pipeline that turns raw agent output into display-ready text and HTML
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Optional, Dict, List, Iterator, Tuple
+
+# Speaker prefixes the model sometimes echoes at the start of an answer
+SPEAKER_PREFIXES = ("Bot:", "Assistant:", "AI:", "BookBuddy:", "Human:", "User:")
+
+_BOT_LINE_RE = re.compile(r'\n\s*Bot:\s*')
+_BOT_INLINE_RE = re.compile(r'\s+Bot:\s*')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+_URL_UNSAFE_RE = re.compile(r'[^\w\s]')
+
+# Tokens for the "Title by Author - description" scanner (see _BookLineScanner).
+# The whitespace before "by" is checked separately: a lookbehind would
+# defeat the literal-prefix search
+_BY_TOKEN_RE = re.compile(r'by(?=\s)')
+_WS_RE = re.compile(r'\s*')
+_AUTHOR_STOP_RE = re.compile(r'[-–\n]')
+_SEGMENT_END_RE = re.compile(r'[*\n]')
+_SEGMENT_GAP_RE = re.compile(r'[*\n]*')
+_DASHES = "-–"
+
+_AMAZON_URL_RE = re.compile(r'https://amazon\.com/s\?k=[^\s\n]+')
+# Book headers a following link can be rebuilt from, each with a character
+# it cannot match without, so absent formats cost a substring check
+_BOOK_HEADER_RES = (
+    ("📚", re.compile(r'📚\s*\*\*(.*?)\*\*\s*by\s*(.*?)(?:\n|$)', re.IGNORECASE)),  # Standard format
+    ('"', re.compile(r'book\s+"([^"]+)"\s*by\s*([^\n]+)', re.IGNORECASE)),         # "Book Title" by Author
+)
+
+# Longer links are the model running the description into the URL
+MAX_URL_LENGTH = 80
+
+# HTML decoration stages. Each pattern starts with a literal, which lets the
+# regex engine skip ahead; one combined alternation measured slower.
+_SUMMARY_RE = re.compile(r'📖[^\n]*(?:\n(?!📚|🛒)[^\n]*)*')
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+
+LINK_STYLE = "color: #007bff; text-decoration: underline;"
+
+
+def amazon_search_url(title: str, author: str) -> str:
+    """Generate Amazon search URL for a book."""
+    # Clean title and author
+    title = title.strip().strip('"').strip("'").strip()
+    author = author.strip().strip('"').strip("'").strip()
+
+    # Drop special characters, then join the words with single + signs
+    search_query = _URL_UNSAFE_RE.sub('', f"{title} {author}")
+    search_query = "+".join(word for word in search_query.split(" ") if word)
+
+    return f"https://amazon.com/s?k={search_query}"
+
+
+def clean_agent_output(output_text: str) -> str:
+    """Strip speaker prefixes, stray "Bot:" markers and extra blank lines."""
+    cleaned_output = output_text.strip()
+
+    # Remove prefixes from the beginning
+    for prefix in SPEAKER_PREFIXES:
+        if cleaned_output.startswith(prefix):
+            cleaned_output = cleaned_output[len(prefix):].strip()
+            break
+
+    # Answers almost never contain "Bot:", so the common case is one pass
+    if "Bot:" in cleaned_output:
+        cleaned_output = _BOT_LINE_RE.sub('\n', cleaned_output)
+        cleaned_output = _BOT_INLINE_RE.sub(' ', cleaned_output)
+
+    # Clean up extra whitespace
+    cleaned_output = _BLANK_LINES_RE.sub('\n\n', cleaned_output)
+    return cleaned_output.strip()
+
+
+class _BookLineScanner:
+    """Finds "Title by Author - description" lines in linear time.
+
+    Produces exactly the matches re.sub() would find for the original
+    link-injection pattern (under re.MULTILINE)
+
+        ([*]{0,2})([^*\\n]+?)([*]{0,2})\\s+by\\s+([^-–\\n]+?)(?:\\s*[-–]\\s*([^\\n]+?))?(?:\\n|$)
+
+    which backtracks quadratically on long lines. Every match is anchored on
+    a whitespace-delimited "by" token, so each token's author/description
+    clause is resolved once, and titles are then placed in front of the
+    first token that can complete a match. Scans are memoized, so every
+    character is visited a bounded number of times.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self._clauses: Dict[int, Optional[Tuple[int, int, Optional[Tuple[int, int]], int]]] = {}
+        self._run_starts: Dict[int, int] = {}
+        self._descriptions: Dict[int, Optional[Tuple[int, int, int]]] = {}
+        # Last next_stop() query and its answer; clauses are resolved left
+        # to right, so most lookups are answered without rescanning
+        self._stop_cache = (-1, -1)
+        self._newlines: Optional[List[int]] = None
+        self._last_non_newline: Optional[int] = None
+
+    def ws_end(self, i: int) -> int:
+        """End of the whitespace run starting at i."""
+        return _WS_RE.match(self.text, i).end()
+
+    def run_start(self, i: int) -> int:
+        """Start of the whitespace run ending at i."""
+        start = self._run_starts.get(i)
+        if start is None:
+            start = i
+            while start > 0 and self.text[start - 1].isspace():
+                start -= 1
+            self._run_starts[i] = start
+        return start
+
+    def next_stop(self, i: int) -> int:
+        """First dash or newline at or after i (the end of an author)."""
+        queried, found = self._stop_cache
+        if queried <= i <= found:
+            return found
+        match = _AUTHOR_STOP_RE.search(self.text, i)
+        found = match.start() if match else self.length
+        self._stop_cache = (i, found)
+        return found
+
+    def line_end(self, i: int) -> int:
+        """Position of the newline ending the line that contains i."""
+        if self._newlines is None:
+            self._newlines = [m.start() for m in re.finditer('\n', self.text)]
+        index = bisect_left(self._newlines, i)
+        return self._newlines[index] if index < len(self._newlines) else self.length
+
+    def description(self, dash: int) -> Optional[Tuple[int, int, int]]:
+        """(start, end, match end) of the description after the dash at dash."""
+        if dash in self._descriptions:
+            return self._descriptions[dash]
+
+        start = self.ws_end(dash + 1)
+        if start >= self.length:
+            # Only whitespace follows; the regex gives back the last
+            # non-newline character of the text as a one-character description
+            if self._last_non_newline is None:
+                self._last_non_newline = len(self.text.rstrip('\n')) - 1
+            start = self._last_non_newline
+            result = None
+            if start > dash:
+                result = (start, start + 1, min(start + 2, self.length))
+        else:
+            end = self.line_end(start)
+            result = (start, end, min(end + 1, self.length))
+
+        self._descriptions[dash] = result
+        return result
+
+    def author(self, start: int, stop: int) -> Optional[Tuple[int, int, Optional[Tuple[int, int]], int]]:
+        """Resolve an author starting at start whose text runs up to stop."""
+        text = self.text
+        if start >= self.length or text[start] in "-–\n":
+            return None
+
+        # A dash after the author (possibly on a later line) starts a
+        # description; the lazy author ends where that whitespace begins
+        dash = self.ws_end(stop)
+        if dash < self.length and text[dash] in _DASHES:
+            description = self.description(dash)
+            if description is not None:
+                author_end = max(start + 1, self.run_start(stop))
+                return start, author_end, description[:2], description[2]
+
+        if stop == self.length:
+            return start, stop, None, stop
+        if text[stop] == '\n':
+            return start, stop, None, stop + 1
+        return None
+
+    def clause(self, by: int) -> Optional[Tuple[int, int, Optional[Tuple[int, int]], int]]:
+        """Resolve the author and description after the "by" token at by.
+
+        Returns (author start, author end, description span, match end), or
+        None when no title in front of this token can complete a match.
+        """
+        if by in self._clauses:
+            return self._clauses[by]
+
+        text = self.text
+        author_start = self.ws_end(by + 2)
+        stop = self.next_stop(author_start)
+        result = self.author(author_start, stop)
+
+        # The greedy whitespace after "by" backs off one character at a time,
+        # letting the author start with whitespace
+        if result is None and author_start - 1 >= by + 3 and text[author_start - 1] != '\n':
+            result = self.author(author_start - 1, stop)
+        if result is None:
+            last_newline = text.rfind('\n', by + 3, author_start)
+            if last_newline != -1:
+                head = text[by + 3:last_newline].rstrip('\n')
+                if head:
+                    start = by + 2 + len(head)
+                    dash = author_start if author_start < self.length and text[author_start] in _DASHES else -1
+                    description = self.description(dash) if dash != -1 else None
+                    if description is not None:
+                        result = (start, start + 1, description[:2], description[2])
+                    else:
+                        result = (start, start + 1, None, start + 2)
+
+        self._clauses[by] = result
+        return result
+
+    def matches(self) -> Iterator[Tuple[int, int, str, str, Optional[str]]]:
+        """Yield (start, end, title, author, description) for each match."""
+        text, length = self.text, self.length
+        tokens = [i for i in (m.start() for m in _BY_TOKEN_RE.finditer(text))
+                  if i and text[i - 1].isspace()]
+        token_index = 0
+        last_end = 0
+        pos = 0
+
+        while True:
+            # Titles never contain "*" or newlines; skip to the next segment
+            pos = _SEGMENT_GAP_RE.match(text, pos).end()
+            if pos >= length:
+                return
+
+            # First "by" token after this point that can complete a match
+            while token_index < len(tokens) and (tokens[token_index] < pos + 2
+                                                 or self.clause(tokens[token_index]) is None):
+                token_index += 1
+            if token_index == len(tokens):
+                return
+            by = tokens[token_index]
+            gap_start = self.run_start(by)
+
+            # Segments ending before the whitespace in front of the token
+            # (less a possible "**") cannot reach it
+            if gap_start - 3 > pos:
+                jump = max(text.rfind('*', pos, gap_start - 2), text.rfind('\n', pos, gap_start - 2)) + 1
+                if jump > pos:
+                    pos = jump
+                    continue
+
+            segment_match = _SEGMENT_END_RE.search(text, pos)
+            segment_end = segment_match.start() if segment_match else length
+
+            title_end = max(gap_start, pos + 1)
+            if title_end >= segment_end:
+                title_end = None
+                if segment_end < length:
+                    closing = gap_start - segment_end
+                    if text[segment_end] == '\n' and gap_start <= segment_end:
+                        # Title at the end of a line, "by" on a later one
+                        title_end = segment_end
+                    elif 1 <= closing <= 2 and text[segment_end:gap_start] == '*' * closing:
+                        # "**Title** by": closing stars right before the whitespace
+                        title_end = segment_end
+
+            if title_end is None:
+                pos = segment_end
+                continue
+
+            # Opening stars (at most two) belong to the match
+            start = pos
+            while start > last_end and pos - start < 2 and text[start - 1] == '*':
+                start -= 1
+
+            author_start, author_end, description, end = self._clauses[by]
+            yield (start, end, text[pos:title_end], text[author_start:author_end],
+                   text[description[0]:description[1]] if description else None)
+            last_end = pos = end
+
+
+def _book_entry(title: str, author: str, description: Optional[str]) -> str:
+    title = title.strip().strip('-–').strip()
+    author = author.strip().rstrip('-–').strip().strip('-–').strip()
+
+    result = f"📚 **{title}** by {author}"
+    if description:
+        result += f"\n{description}"
+    result += f"\n🛒 Buy: {amazon_search_url(title, author)}\n"
+    return result
+
+
+def add_missing_links(response: str) -> str:
+    """Add Amazon links to "Title by Author" lines when the model left them out."""
+    # Only enhance if no Amazon links are already present
+    if "amazon.com" in response.lower():
+        return response
+
+    parts = []
+    last_end = 0
+    for start, end, title, author, description in _BookLineScanner(response).matches():
+        parts.append(response[last_end:start])
+        parts.append(_book_entry(title, author, description))
+        last_end = end
+    if not parts:
+        return response
+    parts.append(response[last_end:])
+    return "".join(parts)
+
+
+def process_response(output_text: str) -> str:
+    """Full text pipeline applied to every agent answer."""
+    return repair_amazon_urls(add_missing_links(clean_agent_output(output_text)))
+
+
+def repair_amazon_urls(text: str) -> str:
+    """Rebuild malformed (overlong) Amazon URLs from the nearest book header before them."""
+    if "amazon.com/s?k=" not in text:
+        return text
+    malformed = [m for m in _AMAZON_URL_RE.finditer(text) if m.end() - m.start() > MAX_URL_LENGTH]
+    if not malformed:
+        return text
+
+    # Index every header by where it ends, then look each URL up by position
+    headers = sorted((m.end(), m.group(1), m.group(2))
+                     for marker, pattern in _BOOK_HEADER_RES if marker in text
+                     for m in pattern.finditer(text))
+    header_ends = [end for end, _, _ in headers]
+
+    parts = []
+    last_end = 0
+    for match in malformed:
+        index = bisect_right(header_ends, match.start()) - 1
+        if index < 0:
+            continue
+        _, title, author = headers[index]
+        parts.append(text[last_end:match.start()])
+        parts.append(amazon_search_url(title, author))
+        last_end = match.end()
+
+    if not parts:
+        return text
+    parts.append(text[last_end:])
+    return "".join(parts)
+
+
+def _summary_html(match: "re.Match") -> str:
+    return f'<div class="summary-section">{match.group(0)}</div>'
+
+
+def _link_html(match: "re.Match") -> str:
+    url = match.group(0)
+    return f'<a href="{url}" target="_blank" style="{LINK_STYLE}">{url}</a>'
+
+
+def render_response_html(response: str) -> str:
+    """Turn a processed answer into HTML with summary boxes, links and bold text."""
+    html = response
+    if "📖" in html:
+        html = _SUMMARY_RE.sub(_summary_html, html)
+    if "amazon.com/s?k=" in html:
+        html = _AMAZON_URL_RE.sub(_link_html, html)
+    if "**" in html:
+        html = _BOLD_RE.sub(r'<strong>\1</strong>', html)
+    return html
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Query Index
+Canonicalizes book requests and finds near-duplicate earlier queries with MinHash
+"""
+
+import difflib
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Tuple, FrozenSet
+
+# Multi-word phrases are folded into single tokens before tokenizing
+PHRASE_SYNONYMS = {
+    "science fiction": "scifi",
+    "sci fi": "scifi",
+    "self help": "selfhelp",
+    "self improvement": "selfhelp",
+    "personal development": "selfhelp",
+    "non fiction": "nonfiction",
+    "young adult": "youngadult",
+    "true crime": "truecrime",
+    "historical fiction": "historicalfiction",
+}
+
+# Single-word synonyms, applied after plural stripping
+WORD_SYNONYMS = {
+    "sf": "scifi",
+    "ya": "youngadult",
+    "motivational": "motivation",
+    "inspirational": "motivation",
+    "inspiring": "motivation",
+    "inspiration": "motivation",
+    "whodunit": "mystery",
+    "detective": "mystery",
+    "thrilling": "thriller",
+    "memoir": "biography",
+    "autobiography": "biography",
+    "romantic": "romance",
+    "entrepreneur": "business",
+    "entrepreneurship": "business",
+    "startup": "business",
+    "psychological": "psychology",
+    "productive": "productivity",
+}
+
+STOPWORDS = frozenset("""
+a about all an and any are best book can could do find for give good great i
+in is looking me my novel of on please read recommend recommendation show some
+something suggest suggestion that the title to top want what with you
+""".split())
+
+# How alike two differing words must be to count as a typo of each other;
+# shorter words must match exactly
+TYPO_RATIO = 0.8
+TYPO_MIN_LENGTH = 4
+
+
+def _singular(word: str) -> str:
+    """Strip simple English plural endings."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def canonicalize_query(query: str) -> str:
+    """Reduce a query to sorted, de-duplicated canonical tokens."""
+    text = re.sub(r'[^a-z0-9]+', ' ', query.lower()).strip()
+    for phrase, replacement in PHRASE_SYNONYMS.items():
+        text = re.sub(rf'\b{phrase}s?\b', replacement, text)
+
+    tokens = set()
+    for word in text.split():
+        word = WORD_SYNONYMS.get(word, word)
+        word = _singular(word)
+        word = WORD_SYNONYMS.get(word, word)
+        if word not in STOPWORDS:
+            tokens.add(word)
+
+    return " ".join(sorted(tokens))
+
+
+def shingles(canonical: str, size: int = 3) -> FrozenSet[str]:
+    """Return word tokens plus character shingles of a canonical query."""
+    result = set(canonical.split())
+    for token in canonical.split():
+        padded = f"#{token}#"
+        for i in range(max(1, len(padded) - size + 1)):
+            result.add(padded[i:i + size])
+    return frozenset(result)
+
+
+def _is_typo(word: str, others: FrozenSet[str]) -> bool:
+    # Numbers ("world war 2", "12 year olds", "1984") must match exactly
+    if len(word) < TYPO_MIN_LENGTH or word.isdigit():
+        return False
+    return any(len(other) >= TYPO_MIN_LENGTH and not other.isdigit() and
+               difflib.SequenceMatcher(None, word, other).ratio() >= TYPO_RATIO
+               for other in others)
+
+
+def words_agree(canonical_a: str, canonical_b: str) -> bool:
+    """True if every word in one query has the same word, or a likely typo of it, in the other.
+
+    Numbers count only when they are the same number.
+
+    Shingle similarity alone lets one short distinguishing word ("by" vs
+    "about", "women") slip under the threshold; this vetoes such matches.
+    """
+    words_a = frozenset(canonical_a.split())
+    words_b = frozenset(canonical_b.split())
+    return (all(_is_typo(word, words_b) for word in words_a - words_b) and
+            all(_is_typo(word, words_a) for word in words_b - words_a))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Exact Jaccard similarity of two shingle sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class QueryMatch:
+    """Explains why a query was matched to an earlier one."""
+
+    __slots__ = ("query", "matched_query", "canonical", "matched_canonical",
+                 "similarity", "reason", "payload")
+
+    def __init__(self, query: str, matched_query: str, canonical: str,
+                 matched_canonical: str, similarity: float, reason: str, payload: Any):
+        self.query = query
+        self.matched_query = matched_query
+        self.canonical = canonical
+        self.matched_canonical = matched_canonical
+        self.similarity = similarity
+        self.reason = reason
+        self.payload = payload
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the match as a plain dict for logging."""
+        return {name: getattr(self, name) for name in self.__slots__ if name != "payload"}
+
+    def __repr__(self) -> str:
+        return f"QueryMatch({self.query!r} -> {self.matched_query!r}, {self.reason})"
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class SimilarQueryIndex:
+    """MinHash/LSH index over canonical queries, partitioned by namespace."""
+
+    def __init__(self,
+                 threshold: float = 0.8,
+                 num_perm: int = 64,
+                 bands: int = 16,
+                 max_entries: int = 5000,
+                 history_size: int = 100):
+
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+
+        # Deterministic hash permutations
+        seed = hashlib.sha256(b"bookbuddy-minhash").digest()
+        self._perms: List[Tuple[int, int]] = []
+        for i in range(num_perm):
+            digest = hashlib.sha256(seed + i.to_bytes(4, "big")).digest()
+            a = int.from_bytes(digest[:8], "big") % _MERSENNE_PRIME or 1
+            b = int.from_bytes(digest[8:16], "big") % _MERSENNE_PRIME
+            self._perms.append((a, b))
+
+        # (namespace, canonical) -> (original query, shingles, payload)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, FrozenSet[str], Any, Tuple[int, ...]]]" = OrderedDict()
+        # (namespace, band, band hash) -> canonical forms
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], set] = {}
+        self._lock = threading.Lock()
+
+        # Recent matches, kept so false positives can be reviewed
+        self.recent_matches: "deque[QueryMatch]" = deque(maxlen=history_size)
+        self.lookups = 0
+        self.canonical_matches = 0
+        self.similar_matches = 0
+
+    def _signature(self, shingle_set: FrozenSet[str]) -> Tuple[int, ...]:
+        """Compute the MinHash signature of a shingle set."""
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+                  for s in shingle_set]
+        if not hashes:
+            return tuple([0] * self.num_perm)
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, namespace: str, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (namespace, band, signature[start:start + self.rows])
+
+    def add(self, query: str, payload: Any, namespace: str = "") -> None:
+        """Index a query and the payload to return for its near-duplicates."""
+        canonical = canonicalize_query(query)
+        shingle_set = shingles(canonical)
+        signature = self._signature(shingle_set)
+        key = (namespace, canonical)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (query, shingle_set, payload, signature)
+            for band_key in self._band_keys(namespace, signature):
+                self._buckets.setdefault(band_key, set()).add(canonical)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        """Drop an entry and its LSH bucket memberships."""
+        namespace, canonical = key
+        signature = self._entries.pop(key)[3]
+        for band_key in self._band_keys(namespace, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(canonical)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def lookup(self, query: str, namespace: str = "") -> Optional[QueryMatch]:
+        """Find the most similar earlier query at or above the threshold."""
+        canonical = canonicalize_query(query)
+
+        with self._lock:
+            self.lookups += 1
+
+            entry = self._entries.get((namespace, canonical))
+            if entry is not None:
+                self.canonical_matches += 1
+                match = QueryMatch(query, entry[0], canonical, canonical, 1.0,
+                                   f"same canonical form '{canonical}'", entry[2])
+                self.recent_matches.append(match)
+                return match
+
+            shingle_set = shingles(canonical)
+            signature = self._signature(shingle_set)
+
+            candidates = set()
+            for band_key in self._band_keys(namespace, signature):
+                candidates.update(self._buckets.get(band_key, ()))
+
+            best: Optional[Tuple[float, str]] = None
+            for candidate in candidates:
+                similarity = jaccard(shingle_set, self._entries[(namespace, candidate)][1])
+                if similarity < self.threshold or not words_agree(canonical, candidate):
+                    continue
+                if best is None or similarity > best[0]:
+                    best = (similarity, candidate)
+
+            if best is None:
+                return None
+
+            similarity, matched_canonical = best
+            matched_query, _, payload, _ = self._entries[(namespace, matched_canonical)]
+            self.similar_matches += 1
+            match = QueryMatch(
+                query, matched_query, canonical, matched_canonical, similarity,
+                f"shingle similarity {similarity:.2f} >= {self.threshold:.2f}, words agree "
+                f"('{canonical}' ~ '{matched_canonical}')",
+                payload
+            )
+            self.recent_matches.append(match)
+            return match
+
+    def explain(self, query_a: str, query_b: str) -> Dict[str, Any]:
+        """Show how two queries canonicalize and how similar they are."""
+        canonical_a = canonicalize_query(query_a)
+        canonical_b = canonicalize_query(query_b)
+        similarity = jaccard(shingles(canonical_a), shingles(canonical_b))
+        return {
+            "canonical_a": canonical_a,
+            "canonical_b": canonical_b,
+            "similarity": similarity,
+            "words_agree": words_agree(canonical_a, canonical_b),
+            "matches": canonical_a == canonical_b or (similarity >= self.threshold and
+                                                      words_agree(canonical_a, canonical_b)),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup and match counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "canonical_matches": self.canonical_matches,
+                "similar_matches": self.similar_matches,
+                "threshold": self.threshold,
+            }
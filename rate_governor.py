@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Rate Governor
+Paces Bedrock calls per model ID with request and token buckets, queueing callers
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+# Rough size of a Claude token in characters, for estimating a request up front
+CHARS_PER_TOKEN = 4
+
+# Weight of the latest request when updating the observed tokens per request
+USAGE_SMOOTHING = 0.2
+
+
+@dataclass
+class RateLimits:
+    """Quota for one model: requests per second and tokens per minute."""
+    requests_per_second: float
+    tokens_per_minute: float
+
+
+class TokenBucket:
+    """Holds up to capacity tokens, refilled continuously at rate per second.
+
+    The level can go negative when a request turns out to have used more
+    than it reserved; later requests then wait for the debt to refill.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if it can be now)."""
+        self._refill(now)
+        # A request bigger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self) -> None:
+        self.level = min(self.level, 0.0)
+
+
+class Permit:
+    """Permission for one request, holding the tokens reserved for it."""
+
+    def __init__(self, governor: "RateGovernor", model_id: str, tokens: float, waited: float):
+        self.governor = governor
+        self.model_id = model_id
+        self.tokens = tokens
+        self.waited = waited
+        self._settled = False
+
+    def settle(self, used_tokens: Optional[int] = None) -> None:
+        """Report how many tokens the request really used (None if unknown)."""
+        if not self._settled:
+            self._settled = True
+            self.governor._settle(self, used_tokens)
+
+
+class _ModelLane:
+    """Buckets, waiting queue and counters for one model ID."""
+
+    def __init__(self, limits: RateLimits):
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_second, max(1.0, limits.requests_per_second))
+        self.tokens = TokenBucket(limits.tokens_per_minute / 60.0, limits.tokens_per_minute)
+        # Tickets of waiting callers, served in arrival order
+        self.queue: "deque[object]" = deque()
+        self.tokens_per_request: Optional[float] = None
+
+        # Counters
+        self.granted = 0
+        self.queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.throttles = 0
+
+
+class RateGovernor:
+    """Queues Bedrock callers so each model stays within its quota.
+
+    Every call takes one request token and an estimate of its Bedrock
+    tokens before it is sent; callers wait in arrival order until both
+    buckets allow it. Once a request reports its real usage the difference
+    is returned or charged, and later estimates follow the observed
+    average. Models without limits are not paced.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, RateLimits]] = None,
+                 default: Optional[RateLimits] = None):
+        self.default = default
+        self._lanes: Dict[str, _ModelLane] = {
+            model_id: _ModelLane(model_limits) for model_id, model_limits in (limits or {}).items()
+        }
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls, variable: str = "BOOKBUDDY_RATE_LIMITS") -> "RateGovernor":
+        """Build a governor from JSON such as
+        {"anthropic.claude-3-haiku-20240307-v1:0": {"rps": 5, "tpm": 200000}, "default": {...}}.
+        """
+        raw = json.loads(os.environ.get(variable) or "{}")
+        limits = {
+            model_id: RateLimits(float(value["rps"]), float(value["tpm"]))
+            for model_id, value in raw.items()
+        }
+        return cls(limits, default=limits.pop("default", None))
+
+    def set_limits(self, model_id: str, limits: RateLimits) -> None:
+        """Set or replace a model's quota; its counters start over."""
+        with self._cond:
+            self._lanes[model_id] = _ModelLane(limits)
+            self._cond.notify_all()
+
+    def _lane(self, model_id: str) -> Optional[_ModelLane]:
+        lane = self._lanes.get(model_id)
+        if lane is None and self.default is not None:
+            lane = self._lanes[model_id] = _ModelLane(self.default)
+        return lane
+
+    def acquire(self, model_id: str, estimated_tokens: float) -> Permit:
+        """Wait for the model's turn and return a permit for one request.
+
+        estimated_tokens is used until the model has reported real usage.
+        """
+        start = time.monotonic()
+        with self._cond:
+            lane = self._lane(model_id)
+            if lane is None:
+                return Permit(self, model_id, 0.0, 0.0)
+            tokens = lane.tokens_per_request or estimated_tokens
+
+            ticket = object()
+            lane.queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if lane.queue[0] is ticket:
+                        wait = max(lane.requests.wait_time(1, now), lane.tokens.wait_time(tokens, now))
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                lane.queue.remove(ticket)
+                self._cond.notify_all()
+
+            lane.requests.take(1)
+            lane.tokens.take(tokens)
+            waited = time.monotonic() - start
+            lane.granted += 1
+            if waited > 0.001:
+                lane.queued += 1
+            lane.wait_total += waited
+            lane.wait_max = max(lane.wait_max, waited)
+            return Permit(self, model_id, tokens, waited)
+
+    def _settle(self, permit: Permit, used_tokens: Optional[int]) -> None:
+        if not used_tokens:
+            return
+        with self._cond:
+            lane = self._lanes.get(permit.model_id)
+            if lane is None:
+                return
+            if lane.tokens_per_request is None:
+                lane.tokens_per_request = float(used_tokens)
+            else:
+                lane.tokens_per_request += USAGE_SMOOTHING * (used_tokens - lane.tokens_per_request)
+            if permit.tokens:
+                if used_tokens < permit.tokens:
+                    lane.tokens.give(permit.tokens - used_tokens)
+                else:
+                    lane.tokens.take(used_tokens - permit.tokens)
+            self._cond.notify_all()
+
+    def throttled(self, model_id: str) -> bool:
+        """Note that Bedrock throttled a request; waiting callers hold off until the buckets refill.
+
+        Returns False when the model is not paced, so the caller must back off itself.
+        """
+        with self._cond:
+            lane = self._lanes.get(model_id)
+            if lane is None:
+                return False
+            lane.throttles += 1
+            lane.requests.drain()
+            lane.tokens.drain()
+            return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return queue depth, wait times and quota use per model."""
+        with self._cond:
+            now = time.monotonic()
+            result = {}
+            for model_id, lane in self._lanes.items():
+                lane.tokens.wait_time(0, now)
+                result[model_id] = {
+                    "queue_depth": len(lane.queue),
+                    "granted": lane.granted,
+                    "queued": lane.queued,
+                    "wait_mean_ms": round(lane.wait_total / lane.granted * 1000, 1) if lane.granted else 0.0,
+                    "wait_max_ms": round(lane.wait_max * 1000, 1),
+                    "throttles": lane.throttles,
+                    "tokens_available": round(lane.tokens.level) if math.isfinite(lane.tokens.level) else None,
+                    "tokens_per_request": round(lane.tokens_per_request) if lane.tokens_per_request else None,
+                    "requests_per_second": lane.limits.requests_per_second,
+                    "tokens_per_minute": lane.limits.tokens_per_minute,
+                }
+            return result
+
+
+_default_governor: Optional[RateGovernor] = None
+_default_lock = threading.Lock()
+
+
+def default_governor() -> RateGovernor:
+    """Return the process-wide governor, configured from BOOKBUDDY_RATE_LIMITS."""
+    global _default_governor
+    with _default_lock:
+        if _default_governor is None:
+            _default_governor = RateGovernor.from_env()
+        return _default_governor
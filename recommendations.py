@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Recommendations
+Parses a processed agent answer once into compact Book records for rendering
+"""
+
+import html
+import json
+import re
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+from postprocessing import (
+    LINK_STYLE,
+    MAX_URL_LENGTH,
+    SPEAKER_PREFIXES,
+    add_missing_links,
+    amazon_search_url,
+    clean_agent_output,
+)
+
+# "📚 **Title** by Author", optionally numbered and without the emoji
+_HEADER_RE = re.compile(r'^(?:\d+[.)]\s*)?(?:📚\s*)?\*\*(.+?)\*\*\s+by\s+(.+?)\s*$')
+# "📖 **What it's about:** ..." with or without the label and bold markers
+_SUMMARY_LABEL_RE = re.compile(r"^📖\s*(?:\*\*)?(?:What it'?s about:?)?(?:\*\*)?:?\s*", re.IGNORECASE)
+_URL_RE = re.compile(r'https://amazon\.com/s\?k=\S+')
+_AUTHOR_DESCRIPTION_RE = re.compile(r'\s+[-–]\s+')
+# Characters that change JSON structure; everything else is skipped over
+_JSON_TOKEN_RE = re.compile(r'["\\{}\[\]:]')
+
+
+class Book:
+    """One recommended book."""
+
+    __slots__ = ("title", "author", "description", "summary", "url")
+
+    def __init__(self, title: str, author: str, description: str = "",
+                 summary: str = "", url: str = ""):
+        self.title = title
+        self.author = author
+        self.description = description
+        self.summary = summary
+        # Missing or malformed links are rebuilt from the title and author
+        if not url or len(url) > MAX_URL_LENGTH:
+            url = amazon_search_url(title, author)
+        self.url = url
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Case-insensitive identity used to drop repeated recommendations."""
+        return self.title.casefold(), self.author.casefold()
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return the book as a plain dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_markdown(self) -> str:
+        """Render the book in the agent's own text format."""
+        lines = [f"📚 **{self.title}** by {self.author}"]
+        if self.description:
+            lines.append(self.description)
+        if self.summary:
+            lines.append(f"📖 **What it's about:** {self.summary}")
+        lines.append(f"🛒 Buy: {self.url}")
+        return "  \n".join(lines)
+
+    def to_html(self) -> str:
+        """Render the book as a styled HTML card."""
+        url = html.escape(self.url)
+        parts = [
+            '<div class="book-item">',
+            f'<div class="book-title">📚 <strong>{html.escape(self.title)}</strong> by {html.escape(self.author)}</div>',
+        ]
+        if self.description:
+            parts.append(f'<div>{html.escape(self.description)}</div>')
+        if self.summary:
+            parts.append(f'<div class="summary-section"><strong>📖 What it\'s about:</strong>'
+                         f'{html.escape(self.summary)}</div>')
+        parts.append(f'<div>🛒 Buy: <a href="{url}" target="_blank" style="{LINK_STYLE}">{url}</a></div>')
+        parts.append('</div>')
+        return "".join(parts)
+
+    def __repr__(self) -> str:
+        return f"Book({self.title!r} by {self.author!r})"
+
+
+class Recommendations:
+    """The books in one answer plus any free text around them."""
+
+    __slots__ = ("intro", "books", "outro")
+
+    def __init__(self, intro: str = "", books: Optional[List[Book]] = None, outro: str = ""):
+        self.intro = intro
+        self.books = books if books is not None else []
+        self.outro = outro
+
+    def __len__(self) -> int:
+        return len(self.books)
+
+    def __iter__(self) -> Iterator[Book]:
+        return iter(self.books)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the answer as plain data, e.g. for JSON."""
+        return {
+            "intro": self.intro,
+            "books": [book.to_dict() for book in self.books],
+            "outro": self.outro,
+        }
+
+    def to_markdown(self) -> str:
+        """Render the answer as Markdown text."""
+        blocks = [self.intro] if self.intro else []
+        blocks.extend(book.to_markdown() for book in self.books)
+        if self.outro:
+            blocks.append(self.outro)
+        return "\n\n".join(blocks)
+
+    def to_html(self) -> str:
+        """Render the answer as HTML, one card per book."""
+        parts = []
+        if self.intro:
+            parts.append(f'<p>{html.escape(self.intro)}</p>')
+        parts.extend(book.to_html() for book in self.books)
+        if self.outro:
+            parts.append(f'<p>{html.escape(self.outro)}</p>')
+        return "".join(parts)
+
+    def __repr__(self) -> str:
+        return f"Recommendations({self.books!r})"
+
+
+def _parse_header(line: str) -> Optional[Tuple[str, str, str]]:
+    """Return (title, author, inline description) for a book header line."""
+    match = _HEADER_RE.match(line)
+    if not match:
+        return None
+    # "by Author - description" when the model put everything on one line
+    author_parts = _AUTHOR_DESCRIPTION_RE.split(match.group(2), maxsplit=1)
+    description = author_parts[1].strip() if len(author_parts) > 1 else ""
+    return match.group(1).strip(), author_parts[0].strip(), description
+
+
+class RecommendationParser:
+    """Incremental parser over streamed answer text.
+
+    feed() takes chunks as they arrive and returns the books whose blocks
+    finished in that chunk: a book is complete once its purchase line
+    arrives, or when the next book starts. Only the current partial line
+    and the unfinished block are kept, so each chunk costs the same no
+    matter how much text came before it.
+
+    With normalize, raw agent text is cleaned line by line the way
+    process_response() cleans a whole answer: speaker prefixes and "Bot:"
+    markers are stripped, and "Title by Author - description" lines get
+    purchase links while the answer has shown none of its own. A line
+    that would get a link is held back until the next line shows whether
+    the model is writing its own links.
+    """
+
+    def __init__(self, normalize: bool = False):
+        self.books: List[Book] = []
+        self._intro: List[str] = []
+        self._outro: List[str] = []
+        self._seen = set()
+        self._current: Optional[Dict[str, Any]] = None
+        self._after_book = False
+        # Pieces of the line still being streamed, and the raw lines of the
+        # block that has not produced a book yet
+        self._partial: List[str] = []
+        self._block: List[str] = []
+        self.normalize = normalize
+        # Link injection stops once the answer uses the standard format;
+        # _held is (raw line, line with links) awaiting the next line
+        self._inject = True
+        self._held: Optional[Tuple[str, str]] = None
+
+    @property
+    def intro(self) -> str:
+        """Text before the first book."""
+        return "\n".join(self._intro)
+
+    @property
+    def pending_text(self) -> str:
+        """Text received since the last finished book, for a live preview."""
+        return "\n".join(self._block + ["".join(self._partial)]).strip()
+
+    def feed(self, text: str) -> List[Book]:
+        """Consume a chunk and return the books it completed."""
+        self._partial.append(text)
+        if "\n" not in text:
+            return []
+
+        lines = "".join(self._partial).split("\n")
+        tail = lines.pop()
+        self._partial = [tail] if tail else []
+
+        finished: List[Book] = []
+        for line in lines:
+            self._normalized_line(line, finished)
+        return finished
+
+    def close(self) -> List[Book]:
+        """Flush the last line and book once the stream has ended."""
+        finished: List[Book] = []
+        if self._partial:
+            line = "".join(self._partial)
+            self._partial = []
+            self._normalized_line(line, finished)
+        self._release_held(finished, use_links=self._inject)
+        self._finish(finished)
+        return finished
+
+    def _normalized_line(self, raw_line: str, finished: List[Book]) -> None:
+        if not self.normalize:
+            self._line(raw_line, finished)
+            return
+        line = clean_agent_output(raw_line)
+        if not line:
+            return
+        if self._inject and ("amazon.com" in line.lower() or line.startswith("🛒")
+                             or _parse_header(line) is not None):
+            # The model writes the standard format itself
+            self._inject = False
+        self._release_held(finished, use_links=self._inject)
+        if self._inject:
+            linked = add_missing_links(line)
+            if linked != line:
+                self._held = (line, linked)
+                return
+        self._line(line, finished)
+
+    def _release_held(self, finished: List[Book], use_links: bool) -> None:
+        if self._held is None:
+            return
+        line, linked = self._held
+        self._held = None
+        for held_line in (linked if use_links else line).split("\n"):
+            self._line(held_line, finished)
+
+    def result(self) -> Recommendations:
+        """Return everything parsed so far."""
+        return Recommendations(self.intro, list(self.books), "\n".join(self._outro))
+
+    def _finish(self, finished: List[Book]) -> None:
+        current = self._current
+        if current is None:
+            return
+        self._current = None
+        self._after_book = True
+        self._block = []
+
+        book = Book(current["title"], current["author"],
+                    "\n".join(current["description"]), " ".join(current["summary"]),
+                    current["url"])
+        if book.key not in self._seen:
+            self._seen.add(book.key)
+            self.books.append(book)
+            finished.append(book)
+
+    def _line(self, raw_line: str, finished: List[Book]) -> None:
+        line = raw_line.strip()
+        if not line:
+            return
+
+        header = _parse_header(line)
+        if header is not None:
+            self._finish(finished)
+            title, author, description = header
+            self._current = {"title": title, "author": author,
+                             "description": [description] if description else [],
+                             "summary": [], "url": "", "in_summary": False}
+            # Text between two books is not part of either, so only text
+            # after the last one is kept as the outro
+            self._outro = []
+            # Keep the intro in the preview until the first book is out
+            if self._after_book:
+                self._block = []
+            self._block.append(line)
+            return
+
+        self._block.append(line)
+        current = self._current
+        if current is None:
+            if self._after_book:
+                self._outro.append(line)
+            else:
+                if not self._intro:
+                    line = _strip_speaker_prefix(line)
+                if line:
+                    self._intro.append(line)
+            return
+
+        url_match = _URL_RE.search(line)
+        if url_match or line.startswith("🛒"):
+            current["url"] = url_match.group(0) if url_match else ""
+            self._finish(finished)
+        elif line.startswith("📖"):
+            current["in_summary"] = True
+            rest = _SUMMARY_LABEL_RE.sub("", line)
+            if rest:
+                current["summary"].append(rest)
+        elif current["in_summary"]:
+            current["summary"].append(line)
+        else:
+            current["description"].append(line)
+
+
+def _strip_speaker_prefix(line: str) -> str:
+    for prefix in SPEAKER_PREFIXES:
+        if line.startswith(prefix):
+            return line[len(prefix):].strip()
+    return line
+
+
+def parse_recommendations(text: str) -> Recommendations:
+    """Parse a complete answer into books.
+
+    Text before the first book becomes the intro and text after the last
+    one becomes the outro. Repeated books are kept once.
+    """
+    parser = RecommendationParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result()
+
+
+class JsonRecommendationRenderer:
+    """Renders a streamed JSON answer as the agent's Markdown format.
+
+    In JSON output mode the model writes only
+    {"intro": ..., "books": [{"title", "author", "blurb", "summary"?}], "outro": ...}
+    and the emoji, bold markers and purchase links are added here. feed()
+    returns Markdown for every field or book that finished in that chunk,
+    so callers stream it exactly like agent text. Answers that turn out
+    not to be JSON are passed through unchanged.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._mode: Optional[str] = None  # None until decided, then "json" or "text"
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+        self._string_start = -1
+        self._object_start = -1
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._closed = False
+        self._emitted = False
+
+    def feed(self, text: str) -> str:
+        """Consume a chunk and return the Markdown it completed."""
+        self._text += text
+        if self._mode is None:
+            self._mode = self._detect_mode()
+            if self._mode is None:
+                return ""
+        if self._mode == "text":
+            out = self._text[self._position:]
+            self._position = len(self._text)
+            return out
+        return self._scan()
+
+    def close(self) -> str:
+        """Return whatever is left once the stream has ended."""
+        if self._mode == "json":
+            if self._emitted:
+                return ""
+            # JSON we could not use: show the raw answer instead
+            self._position = 0
+        self._mode = "text"
+        out = self._text[self._position:]
+        self._position = len(self._text)
+        return out
+
+    def _detect_mode(self) -> Optional[str]:
+        stripped = self._text.lstrip()
+        if not stripped:
+            return None
+        if stripped[0] == "{":
+            return "json"
+        # Allow a ```json fence around the object
+        if stripped[0] == "`":
+            brace = stripped.find("{")
+            fence = stripped if brace < 0 else stripped[:brace]
+            if not re.fullmatch(r'`{1,3}[A-Za-z]*\s*', fence):
+                return "text"
+            return None if brace < 0 else "json"
+        return "text"
+
+    def _scan(self) -> str:
+        out: List[str] = []
+        text = self._text
+        for match in _JSON_TOKEN_RE.finditer(text, self._position):
+            if self._closed:
+                break
+            i = match.start()
+            char = text[i]
+            if self._in_string:
+                if i == self._escaped_at:
+                    continue
+                if char == "\\":
+                    self._escaped_at = i + 1
+                elif char == '"':
+                    self._in_string = False
+                    self._string_done(text[self._string_start:i + 1], out)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and self._depth == 1:
+                self._key, self._last_string = self._last_string, None
+            elif char in "{[":
+                if char == "[" and self._depth == 1:
+                    self._array_key, self._key = self._key, None
+                elif char == "{" and self._depth == 2 and self._array_key == "books":
+                    self._object_start = i
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._object_start >= 0:
+                    self._book_done(text[self._object_start:i + 1], out)
+                    self._object_start = -1
+                elif self._depth == 0:
+                    self._closed = True
+        self._position = len(text)
+        return "".join(out)
+
+    def _string_done(self, literal: str, out: List[str]) -> None:
+        if self._depth != 1:
+            return
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            return
+        if self._key is None:
+            self._last_string = value
+            return
+        key, self._key = self._key, None
+        if key in ("intro", "outro") and value.strip():
+            out.append(value.strip() + "\n\n")
+            self._emitted = True
+
+    def _book_done(self, literal: str, out: List[str]) -> None:
+        try:
+            item = json.loads(literal)
+        except ValueError:
+            return
+        title = str(item.get("title") or "").strip()
+        author = str(item.get("author") or "").strip()
+        if not title or not author:
+            return
+        book = Book(title, author, str(item.get("blurb") or "").strip(), str(item.get("summary") or "").strip())
+        out.append(book.to_markdown() + "\n\n")
+        self._emitted = True
+
+
+def render_json_answer(text: str) -> str:
+    """Render a complete JSON answer as Markdown (or return non-JSON text as-is)."""
+    renderer = JsonRecommendationRenderer()
+    return (renderer.feed(text) + renderer.close()).strip()
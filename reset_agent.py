@@ -3,44 +3,44 @@
 Reset BookBuddy Agent - Delete and recreate completely
 """
 
-import boto3
-import time
+import os
 
-def reset_bookbuddy():
-    """Delete and recreate BookBuddy agent from scratch."""
-    
-    bedrock = boto3.client("bedrock-agent", region_name="us-east-1")
-    agent_name = "BookBuddy"
-    
-    print("🔍 Looking for existing BookBuddy agent...")
+from agent_resolver import AgentResolver
+from aws_clients import get_client
+from bookbuddy import DEFAULT_STATE_PATH, JSON_STATE_PATH
+from waiters import wait_for_agent_deleted, wait_for_alias_deleted
+
+# Each output format has its own agent and saved state
+AGENTS = [("BookBuddy", DEFAULT_STATE_PATH), ("BookBuddy-json", JSON_STATE_PATH)]
+
+def delete_bookbuddy_agent(bedrock, resolver, agent_name):
+    """Delete one agent and its aliases; False if the agent could not be deleted."""
+    print(f"🔍 Looking for existing {agent_name} agent...")
     
     # Find existing agent
-    agents_response = bedrock.list_agents()
-    agents = agents_response.get("agentSummaries", [])
-    existing_agent = next((a for a in agents if a['agentName'] == agent_name), None)
+    agent_id = resolver.find_agent_id(agent_name)
     
-    if existing_agent:
-        agent_id = existing_agent['agentId']
+    if agent_id:
         print(f"🗑️ Found agent {agent_name} (ID: {agent_id}), deleting...")
         
         # Delete all aliases first
         try:
-            aliases_response = bedrock.list_agent_aliases(agentId=agent_id)
-            aliases = aliases_response.get("agentAliases", [])
+            aliases = resolver.aliases(agent_id)
             
+            deleted = []
             for alias in aliases:
                 alias_id = alias['agentAliasId']
                 alias_name = alias.get('agentAliasName', 'unknown')
                 print(f"🗑️ Deleting alias: {alias_name}")
                 try:
                     bedrock.delete_agent_alias(agentId=agent_id, agentAliasId=alias_id)
-                    print(f"✅ Deleted alias: {alias_name}")
+                    deleted.append(alias_id)
                 except Exception as e:
                     print(f"⚠️ Error deleting alias {alias_name}: {e}")
             
-            if aliases:
-                print("⏳ Waiting for aliases to be deleted...")
-                time.sleep(15)
+            # Poll until each alias is really gone
+            for alias_id in deleted:
+                wait_for_alias_deleted(bedrock, agent_id, alias_id)
                 
         except Exception as e:
             print(f"⚠️ Error with aliases: {e}")
@@ -48,14 +48,34 @@ def reset_bookbuddy():
         # Now delete the agent
         try:
             bedrock.delete_agent(agentId=agent_id)
-            print(f"✅ Agent {agent_name} deleted")
-            print("⏳ Waiting for deletion to complete...")
-            time.sleep(10)
+            result = wait_for_agent_deleted(bedrock, agent_id)
+            print(f"✅ Agent {agent_name} deleted ({result.elapsed:.1f}s)")
         except Exception as e:
             print(f"❌ Error deleting agent: {e}")
             return False
     else:
-        print("ℹ️ No existing agent found")
+        print(f"ℹ️ No existing {agent_name} agent found")
+    return True
+
+def reset_bookbuddy():
+    """Delete and recreate BookBuddy agents from scratch."""
+    
+    bedrock = get_client("bedrock-agent", "us-east-1")
+    resolver = AgentResolver(bedrock)
+    
+    ok = True
+    for agent_name, state_path in AGENTS:
+        if not delete_bookbuddy_agent(bedrock, resolver, agent_name):
+            ok = False
+            continue
+        
+        # Forget the saved agent so the next start provisions from scratch
+        if os.path.exists(state_path):
+            os.remove(state_path)
+            print(f"🗑️ Removed saved agent state: {state_path}")
+    
+    if not ok:
+        return False
     
     print("✅ Agent reset complete. Now run: python3 bookbuddy.py")
     return True
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Response Cache
+In-memory LRU cache with TTL, backed by an optional SQLite tier on disk
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user query so trivial variations share a cache entry."""
+    query = re.sub(r'\s+', ' ', query.strip().lower())
+    return query.rstrip('.!? ')
+
+
+class ResponseCache:
+    """LRU + TTL cache for agent responses with an optional SQLite disk tier."""
+
+    def __init__(self,
+                 max_entries: int = 256,
+                 ttl_seconds: float = 3600.0,
+                 db_path: Optional[str] = None):
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(query: str, include_summary: bool, version: str) -> str:
+        """Build a cache key from the normalized query, summary flag and agent version."""
+        raw = f"{version}\x1f{int(include_summary)}\x1f{normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, expires_at = row
+                    if expires_at > now:
+                        # Promote to the memory tier
+                        self._store(key, value, expires_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response in both tiers."""
+        expires_at = time.time() + self.ttl_seconds
+
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached response from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Session Pool
+Stable, unique agent session IDs per user that expire with the agent's sessions
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+
+# BookBuddyAgent provisions its agent with this idle session TTL (as does
+# bookbuddy_agent_stack.py); after this long the agent has forgotten the
+# session anyway
+DEFAULT_IDLE_TTL = 1800.0
+
+
+class SessionPool:
+    """Maps each user (browser session, CLI user, ...) to an agent session ID.
+
+    A user keeps the same ID while active, so follow-up questions reuse the
+    agent's context. Sessions idle longer than idle_ttl are dropped, and
+    at most max_sessions are kept, evicting the least recently used.
+    Turns answered in each session are counted, so callers can tell a
+    fresh conversation from a follow-up.
+    """
+
+    def __init__(self,
+                 idle_ttl: float = DEFAULT_IDLE_TTL,
+                 max_sessions: int = 10000,
+                 prefix: str = "session"):
+
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.prefix = prefix
+
+        # owner -> (session ID, last used), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # Session ID -> owner, and turns answered so far per session ID
+        self._owners: Dict[str, str] = {}
+        self._turns: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Counters
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _new_id(self) -> str:
+        return f"{self.prefix}-{uuid.uuid4().hex}"
+
+    def _drop(self, owner: str) -> None:
+        session_id, _ = self._sessions.pop(owner)
+        self._owners.pop(session_id, None)
+        self._turns.pop(session_id, None)
+
+    def _expire(self, now: float) -> None:
+        # Oldest first, so stop at the first session still in use
+        while self._sessions:
+            owner, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            self._drop(owner)
+            self.expired += 1
+
+    def acquire(self, owner: str) -> str:
+        """Return owner's session ID, starting a new session if it has none or it expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(owner)
+            if entry is None:
+                session_id = self._new_id()
+                self.created += 1
+                while len(self._sessions) >= self.max_sessions:
+                    self._drop(next(iter(self._sessions)))
+                    self.evicted += 1
+                self._owners[session_id] = owner
+            else:
+                session_id = entry[0]
+                self._sessions.move_to_end(owner)
+            self._sessions[owner] = (session_id, now)
+            return session_id
+
+    def release(self, owner: str) -> None:
+        """Forget owner's session, e.g. when the user starts a new conversation."""
+        with self._lock:
+            if owner in self._sessions:
+                self._drop(owner)
+
+    def record_turn(self, session_id: str) -> None:
+        """Count an answered turn; IDs this pool did not hand out are ignored."""
+        with self._lock:
+            if session_id in self._owners:
+                self._turns[session_id] = self._turns.get(session_id, 0) + 1
+
+    def has_history(self, session_id: str) -> bool:
+        """True if the session has answered turns the agent may still remember."""
+        with self._lock:
+            return self._turns.get(session_id, 0) > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return live session count and lifetime counters."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "live_sessions": len(self._sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "idle_ttl": self.idle_ttl,
+            }
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Single Flight
+Lets concurrent identical requests share one in-flight agent call
+"""
+
+import threading
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+
+class SharedCallCancelled(Exception):
+    """The caller driving a shared request stopped reading before it finished."""
+
+
+class InFlightCall:
+    """One agent call whose text chunks are fanned out to every attached caller."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.followers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, text: str) -> None:
+        """Add a chunk and wake the callers waiting for it."""
+        with self._cond:
+            self.chunks.append(text)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        """Mark the call complete, or failed with error."""
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def stream(self) -> Iterator[str]:
+        """Yield every chunk from the start, then each new one as it arrives.
+
+        Raises the leader's error once the chunks received before it have
+        been yielded.
+        """
+        position = 0
+        while True:
+            with self._cond:
+                while position == len(self.chunks) and not self.done:
+                    self._cond.wait()
+                new_chunks = self.chunks[position:]
+                position = len(self.chunks)
+                finished = self.done
+            yield from new_chunks
+            if finished and position == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """Tracks in-flight calls by key so duplicates attach instead of starting their own.
+
+    The first caller for a key becomes the leader and makes the real call;
+    callers arriving while it runs follow it. A call is forgotten as soon
+    as it ends, so later requests start fresh.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, InFlightCall] = {}
+        self._lock = threading.Lock()
+
+        # Counters
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str) -> Tuple[InFlightCall, bool]:
+        """Return the call for key and whether this caller leads it."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = InFlightCall()
+            self.leaders += 1
+            return call, True
+
+    def leave(self, key: str, call: InFlightCall, error: Optional[Exception] = None) -> None:
+        """End the leader's call and release its followers."""
+        # Forget the call first so nobody attaches to one that has ended
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.finish(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return coalescing counters."""
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "agent_calls": self.leaders,
+                "calls_saved": self.coalesced,
+                "in_flight": len(self._calls),
+                "saved_ratio": self.coalesced / total if total else 0.0,
+            }
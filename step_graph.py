@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Step Graph
+Runs provisioning steps concurrently as soon as their dependencies finish
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Any, Iterable, List, Tuple
+
+
+class StepFailed(Exception):
+    """A step in the graph raised; carries the step name and original error."""
+
+    def __init__(self, step: str, error: Exception):
+        super().__init__(f"Step '{step}' failed: {error}")
+        self.step = step
+        self.error = error
+
+
+class StepGraph:
+    """A small dependency graph of named steps.
+
+    Each step function receives the results of its dependencies as keyword
+    arguments. Independent steps run concurrently on a thread pool.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._steps: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+        # name -> (start offset, duration) in seconds
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self.total_time = 0.0
+
+    def add(self, name: str, func: Callable[..., Any], depends_on: Iterable[str] = ()) -> None:
+        """Register a step and the steps it depends on."""
+        deps = tuple(depends_on)
+        for dep in deps:
+            if dep not in self._steps:
+                raise ValueError(f"Step '{name}' depends on unknown step '{dep}'")
+        self._steps[name] = (func, deps)
+
+    def run(self) -> Dict[str, Any]:
+        """Run every step and return their results by name.
+
+        On the first failure no new steps are started; steps already running
+        are allowed to finish and StepFailed is raised.
+        """
+        results: Dict[str, Any] = {}
+        remaining = dict(self._steps)
+        started = time.perf_counter()
+
+        def timed(name: str, func: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+            step_start = time.perf_counter()
+            try:
+                return func(**kwargs)
+            finally:
+                finished = time.perf_counter()
+                self.timings[name] = (step_start - started, finished - step_start)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bookbuddy-step") as pool:
+            running = {}
+            failure = None
+
+            while remaining or running:
+                if failure is None:
+                    ready = [name for name, (_, deps) in remaining.items()
+                             if all(dep in results for dep in deps)]
+                    for name in ready:
+                        func, deps = remaining.pop(name)
+                        kwargs = {dep: results[dep] for dep in deps}
+                        running[pool.submit(timed, name, func, kwargs)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        if failure is None:
+                            failure = StepFailed(name, e)
+
+            self.total_time = time.perf_counter() - started
+
+        if failure is not None:
+            raise failure
+        return results
+
+    def timing_report(self) -> List[str]:
+        """Format per-step timings in start order."""
+        lines = []
+        for name, (offset, duration) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            lines.append(f"{name}: {duration:.2f}s (started +{offset:.2f}s)")
+        lines.append(f"total: {self.total_time:.2f}s")
+        return lines
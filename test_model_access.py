@@ -1,8 +1,9 @@
-import boto3
 import json
 
+from aws_clients import get_client
+
 # Test direct model access
-bedrock_runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
+bedrock_runtime = get_client("bedrock-runtime", "us-east-1")
 
 try:
     print("🧪 Testing direct Titan model access...")
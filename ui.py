@@ -6,7 +6,13 @@ A web interface for the BookBuddy AI reading companion with Amazon purchase link
 
 import streamlit as st
 import time
+import uuid
 from bookbuddy import BookBuddyAgent
+from metrics import PhaseMetrics
+from query_index import SimilarQueryIndex
+from recommendations import RecommendationParser
+from response_cache import ResponseCache
+from ui_panels import render_ops_panel
 
 # Configure Streamlit page
 st.set_page_config(
@@ -39,10 +45,18 @@ def initialize_bookbuddy():
         "agent_name": "BookBuddy",
         "foundation_model": "anthropic.claude-3-haiku-20240307-v1:0",
         "alias_name": "BookBuddy",
-        "region": os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+        "region": os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        # "direct" skips Bedrock Agents orchestration and calls the model itself
+        "backend": os.environ.get('BOOKBUDDY_BACKEND', 'agent'),
+        # "json" has the model return bare book records; links and formatting are added here
+        "output_format": os.environ.get('BOOKBUDDY_OUTPUT_FORMAT', 'markdown')
     }
     
-    bookbuddy = BookBuddyAgent(**config)
+    # Cache answers on disk so they survive a Streamlit restart
+    cache = ResponseCache(db_path=".bookbuddy_cache.sqlite3")
+    # Phase timings are also appended to a JSON-lines log for offline analysis
+    metrics = PhaseMetrics(log_path=".bookbuddy_metrics.jsonl")
+    bookbuddy = BookBuddyAgent(**config, cache=cache, query_index=SimilarQueryIndex(), metrics=metrics)
     
     with st.spinner("🚀 Initializing BookBuddy..."):
         try:
@@ -85,7 +99,6 @@ def main():
         """)
         
         st.header("🔧 Settings")
-        session_id = st.text_input("Session ID", value=f"session-{int(time.time())}")
         
         # Debug info
         with st.expander("🔍 Debug Info"):
@@ -124,6 +137,28 @@ def main():
         """)
         return
     
+    # Each browser session keeps one agent session so follow-ups keep context
+    if "session_owner" not in st.session_state:
+        st.session_state.session_owner = uuid.uuid4().hex
+    with st.sidebar:
+        if st.button("🆕 New conversation"):
+            bookbuddy.sessions.release(st.session_state.session_owner)
+        st.caption(f"👥 Live sessions: {bookbuddy.sessions.stats()['live_sessions']}")
+    
+    with st.sidebar:
+        # Per browser session: the agent is shared, so its own setting is left alone
+        trace_steps = st.checkbox("🔎 Trace agent steps", value=False, key="trace_steps",
+                                  help="Ask the agent for orchestration traces to see where its time goes")
+        # Cache statistics
+        if bookbuddy.cache is not None:
+            with st.expander("⚡ Cache Stats"):
+                st.json(bookbuddy.cache.stats())
+            if bookbuddy.query_index is not None:
+                st.write("**Near-duplicate matches:**")
+                st.json(bookbuddy.query_index.stats())
+                for match in list(bookbuddy.query_index.recent_matches)[-5:]:
+                    st.caption(f"'{match.query}' → '{match.matched_query}': {match.reason}")
+    
     # Main chat interface
     st.header("💬 Ask BookBuddy for Recommendations")
     
@@ -168,19 +203,38 @@ def main():
     if get_recommendation and user_input:
         with st.spinner("🤔 BookBuddy is thinking..."):
             try:
-                response = bookbuddy.chat(user_input, session_id)
+                # Show each book as soon as its purchase line arrives, with
+                # the unfinished block streaming live below the finished ones
+                intro_output = st.empty()
+                books_area = st.container()
+                live_output = st.empty()
+                parser = RecommendationParser(normalize=True)
+                session_id = bookbuddy.sessions.acquire(st.session_state.session_owner)
+                
+                def show_pending(parser):
+                    live_output.markdown(parser.pending_text + "▌")
                 
-                if response and not response.startswith("❌"):
+                for book in bookbuddy.recommend_stream(user_input, session_id, parser=parser,
+                                                       on_chunk=show_pending, trace=trace_steps):
+                    if len(parser.books) == 1:
+                        intro_output.markdown(parser.intro)
+                    books_area.markdown(book.to_markdown())
+                live_output.empty()
+                
+                # Reruns render the stored records
+                response = parser.result()
+                intro_output.markdown(response.intro)
+                if response.outro:
+                    st.markdown(response.outro)
+                
+                if response.books or response.intro:
                     st.success("📚 Here are BookBuddy's recommendations:")
                     
-                    # Display response with proper formatting
-                    st.markdown(response)
-                    
                     # Add some helpful notes
                     st.info("💡 **Tip:** Click the Amazon links to purchase books directly!")
                     
                 else:
-                    st.error(f"❌ Error getting recommendations: {response}")
+                    st.error("❌ Error getting recommendations: empty response")
                     
             except Exception as e:
                 st.error(f"❌ An error occurred: {str(e)}")
@@ -206,7 +260,11 @@ def main():
         for i, chat in enumerate(reversed(st.session_state.chat_history[-3:])):  # Show last 3
             with st.expander(f"💬 {chat['user'][:50]}..." if len(chat['user']) > 50 else f"💬 {chat['user']}"):
                 st.markdown(f"**You:** {chat['user']}")
-                st.markdown(f"**BookBuddy:** {chat['bookbuddy']}")
+                st.markdown("**BookBuddy:**")
+                st.markdown(chat['bookbuddy'].to_markdown())
+    
+    # Rendered last so it includes this run's request
+    render_ops_panel(bookbuddy)
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Streamlit Panels
+Sidebar ops panels shared by both Streamlit UIs
+"""
+
+import json
+import streamlit as st
+from agent_trace import summarize_traces
+
+
+def render_ops_panel(bookbuddy):
+    """Sidebar panel with live p50/p95/p99 latency per phase."""
+    with st.sidebar.expander("📈 Ops: Phase Latency"):
+        if bookbuddy.single_flight is not None:
+            st.write("**Shared in-flight requests:**")
+            st.json(bookbuddy.single_flight.stats())
+        governor_stats = bookbuddy.governor.stats()
+        if governor_stats:
+            st.write("**Rate governor (queue depth, waits):**")
+            st.table([{"model": model_id, **stats} for model_id, stats in governor_stats.items()])
+        summary = bookbuddy.metrics.summary()
+        if not summary:
+            st.caption("No requests timed yet")
+            return
+        for operation, phases in summary.items():
+            st.write(f"**{operation}** (ms)")
+            st.table([{"phase": phase, **row} for phase, row in phases.items()])
+        st.download_button("⬇️ OpenMetrics", bookbuddy.metrics.to_openmetrics(),
+                           file_name="bookbuddy_metrics.txt", mime="text/plain")
+        st.write("**Recent requests:**")
+        for record in list(bookbuddy.metrics.recent_records)[-5:]:
+            st.code(json.dumps(record, ensure_ascii=False), language="json")
+
+    if bookbuddy.traces:
+        render_trace_summary(bookbuddy)
+
+
+def render_trace_summary(bookbuddy):
+    """Sidebar panel showing which agent step dominates latency."""
+    traces = list(bookbuddy.traces)
+    with st.sidebar.expander(f"🔎 Agent Steps ({len(traces)} traced)"):
+        summaries = summarize_traces(traces)
+        grand_total = sum(summary.total for summary in summaries) or 1.0
+        st.table([{"step": summary.step, "requests": summary.requests,
+                   "mean_ms": round(summary.mean * 1000), "p95_ms": round(summary.p95 * 1000),
+                   "share": f"{summary.total / grand_total:.0%}"} for summary in summaries])
+        st.write(f"**Latest:** {traces[-1].query}")
+        st.code("\n".join(traces[-1].timeline()))
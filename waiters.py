@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+BookBuddy Waiters
+Status polling with exponential backoff, jitter and deadlines for agent provisioning
+"""
+
+import random
+import time
+from typing import Callable, Optional, Any, Iterable, Set
+
+from botocore.exceptions import ClientError
+
+# Agent statuses where no create/update/prepare is in progress
+STABLE_AGENT_STATUSES = {"NOT_PREPARED", "PREPARED"}
+
+
+class WaiterError(Exception):
+    """A polled resource reached a failure state."""
+
+
+class WaiterTimeout(WaiterError):
+    """A polled resource did not become ready before the deadline."""
+
+
+class WaitResult:
+    """How long a wait took and what the last poll returned."""
+
+    __slots__ = ("description", "elapsed", "attempts", "value")
+
+    def __init__(self, description: str, elapsed: float, attempts: int, value: Any):
+        self.description = description
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"WaitResult({self.description!r}, {self.elapsed:.2f}s, {self.attempts} checks)"
+
+
+def poll_until(fetch: Callable[[], Any],
+               ready: Callable[[Any], bool],
+               description: str,
+               failed: Optional[Callable[[Any], bool]] = None,
+               timeout: float = 300.0,
+               initial_delay: float = 0.5,
+               max_delay: float = 10.0,
+               backoff: float = 2.0,
+               jitter: float = 0.25,
+               sleep: Callable[[float], None] = time.sleep) -> WaitResult:
+    """Call fetch() until ready(value) is true, backing off between polls.
+
+    Raises WaiterError if failed(value) is true and WaiterTimeout once the
+    deadline passes.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    attempts = 0
+    announced = False
+
+    while True:
+        attempts += 1
+        value = fetch()
+
+        if ready(value):
+            elapsed = time.monotonic() - start
+            if announced:
+                print(f"✅ Done waiting for {description} ({elapsed:.1f}s, {attempts} checks)")
+            return WaitResult(description, elapsed, attempts, value)
+
+        if failed is not None and failed(value):
+            raise WaiterError(f"{description} failed: {value}")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise WaiterTimeout(f"Timed out after {timeout:.0f}s waiting for {description} (last: {value})")
+
+        if not announced:
+            print(f"⏳ Waiting for {description}...")
+            announced = True
+
+        pause = delay * random.uniform(1 - jitter, 1 + jitter)
+        sleep(min(pause, remaining))
+        delay = min(max_delay, delay * backoff)
+
+
+def _error_code(error: ClientError) -> str:
+    return error.response.get("Error", {}).get("Code", "")
+
+
+def wait_for_agent_status(client, agent_id: str, statuses: Iterable[str],
+                          timeout: float = 300.0, **kwargs) -> WaitResult:
+    """Wait until get_agent reports one of the given statuses."""
+    targets: Set[str] = set(statuses)
+
+    def fetch() -> Optional[str]:
+        return client.get_agent(agentId=agent_id)["agent"].get("agentStatus")
+
+    return poll_until(
+        fetch,
+        lambda status: status in targets,
+        f"agent {agent_id} to be {'/'.join(sorted(targets))}",
+        failed=lambda status: status == "FAILED" and "FAILED" not in targets,
+        timeout=timeout,
+        **kwargs
+    )
+
+
+def wait_for_agent_deleted(client, agent_id: str, timeout: float = 300.0, **kwargs) -> WaitResult:
+    """Wait until get_agent no longer finds the agent."""
+    def fetch() -> Optional[str]:
+        try:
+            return client.get_agent(agentId=agent_id)["agent"].get("agentStatus")
+        except ClientError as e:
+            if _error_code(e) == "ResourceNotFoundException":
+                return None
+            raise
+
+    return poll_until(fetch, lambda status: status is None,
+                      f"agent {agent_id} to be deleted", timeout=timeout, **kwargs)
+
+
+def wait_for_alias_status(client, agent_id: str, alias_id: str, statuses: Iterable[str],
+                          timeout: float = 300.0, **kwargs) -> WaitResult:
+    """Wait until get_agent_alias reports one of the given statuses."""
+    targets: Set[str] = set(statuses)
+
+    def fetch() -> Optional[str]:
+        response = client.get_agent_alias(agentId=agent_id, agentAliasId=alias_id)
+        return response["agentAlias"].get("agentAliasStatus")
+
+    return poll_until(
+        fetch,
+        lambda status: status in targets,
+        f"alias {alias_id} to be {'/'.join(sorted(targets))}",
+        failed=lambda status: status == "FAILED" and "FAILED" not in targets,
+        timeout=timeout,
+        **kwargs
+    )
+
+
+def wait_for_alias_deleted(client, agent_id: str, alias_id: str,
+                           timeout: float = 300.0, **kwargs) -> WaitResult:
+    """Wait until get_agent_alias no longer finds the alias."""
+    def fetch() -> Optional[str]:
+        try:
+            response = client.get_agent_alias(agentId=agent_id, agentAliasId=alias_id)
+            return response["agentAlias"].get("agentAliasStatus")
+        except ClientError as e:
+            if _error_code(e) == "ResourceNotFoundException":
+                return None
+            raise
+
+    return poll_until(fetch, lambda status: status is None,
+                      f"alias {alias_id} to be deleted", timeout=timeout, **kwargs)
+
+
+def wait_for_role(iam_client, role_name: str, policy_arn: Optional[str] = None,
+                  timeout: float = 60.0, **kwargs) -> WaitResult:
+    """Wait until get_role sees the role and, if given, its attached policy."""
+    def fetch() -> bool:
+        try:
+            iam_client.get_role(RoleName=role_name)
+        except ClientError as e:
+            if _error_code(e) == "NoSuchEntity":
+                return False
+            raise
+        if policy_arn is None:
+            return True
+        attached = iam_client.list_attached_role_policies(RoleName=role_name)
+        return any(p["PolicyArn"] == policy_arn for p in attached.get("AttachedPolicies", []))
+
+    return poll_until(fetch, bool, f"IAM role {role_name}", timeout=timeout, **kwargs)